@@ -1,27 +1,1973 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QMessageBox, QComboBox,QWidget, QVBoxLayout, QHBoxLayout
-from PyQt5.QtGui import QPixmap, QTransform, QImage
-from PyQt5.QtCore import Qt
-from PIL import Image, ImageEnhance
+from PyQt5.QtWidgets import QFrame, QGraphicsPixmapItem, QGraphicsScene, QGraphicsView, QStyle
+from PyQt5.QtGui import QBitmap, QKeyEvent, QMouseEvent, QPixmap, QRegion, QTransform, QImage, QImageReader, QPainter, QPainterPath, QColor, QPen, QFont
+from PyQt5.QtCore import Qt, QEvent, QObject, QLineF, QPoint, QPointF, QRect, QRectF, QSize, QSizeF, QTimer, pyqtSignal
+from PyQt5 import sip
+# Pillow est importé au besoin : un démarrage depuis le paquet d'outils précompilé s'en passe
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import functools
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
 import sys
+import threading
+import time
+
+
+def make_white_transparent(pil_image, alpha, tolerance=0):
+    """
+    Rend semi-transparents les pixels blancs (ou proches du blanc) d'une image RGBA.
+
+    Le traitement se fait par opérations sur les canaux Pillow (exécutées en C),
+    sans boucle Python sur les pixels.
+
+    Args:
+        pil_image (PIL.Image.Image): Image RGBA, modifiée sur place.
+        alpha (int): Valeur alpha appliquée aux pixels blancs.
+        tolerance (int): Écart maximal à 255 toléré sur chaque canal R, G et B
+            (0 = uniquement le blanc pur).
+
+    Returns:
+        PIL.Image.Image: L'image modifiée.
+    """
+    from PIL import ImageChops
+
+    r, g, b, a = pil_image.split()
+
+    # Masque à 255 lorsque le canal est >= 255 - tolérance, 0 sinon
+    threshold = 255 - tolerance
+    table = [255 if value >= threshold else 0 for value in range(256)]
+    mask = ImageChops.darker(ImageChops.darker(r.point(table), g.point(table)), b.point(table))
+
+    # Remplacer l'alpha uniquement là où les trois canaux sont blancs
+    a.paste(alpha, mask=mask)
+    pil_image.putalpha(a)
+    return pil_image
+
+
+def enhance_contrast_brightness(pil_image, contrast, brightness):
+    """
+    Applique ImageEnhance.Contrast puis ImageEnhance.Brightness en une seule passe.
+
+    Chaque réglage d'ImageEnhance crée deux images complètes (image dégradée et mélange).
+    Le résultat ne dépendant que de la valeur de chaque canal (et de la luminance moyenne
+    pour le contraste), il est précalculé sur les 256 valeurs possibles puis appliqué
+    avec une table : le résultat est identique, pour une seule image créée.
+
+    Args:
+        pil_image (PIL.Image.Image): Image RGBA.
+        contrast (float): Facteur de contraste.
+        brightness (float): Facteur de luminosité.
+
+    Returns:
+        PIL.Image.Image: Nouvelle image, l'alpha est inchangé.
+    """
+    from PIL import Image, ImageStat
+
+    # Même calcul de la moyenne et mêmes arrondis qu'ImageEnhance
+    mean = int(ImageStat.Stat(pil_image.convert("L")).mean[0] + 0.5)
+    ramp = Image.frombytes("L", (256, 1), bytes(range(256)))
+    ramp = Image.blend(Image.new("L", ramp.size, mean), ramp, contrast)
+    ramp = Image.blend(Image.new("L", ramp.size, 0), ramp, brightness)
+    table = list(ramp.tobytes())
+    return pil_image.point(table * 3 + list(range(256)))
+
+
+def pil_to_qimage(pil_image):
+    """
+    Convertit une image Pillow RGBA en QImage, sans copie intermédiaire en `bytes`.
+
+    La QImage est allouée d'abord et possède la mémoire : Pillow y écrit directement
+    ses pixels au travers d'une image qui partage ce tampon. Cette vue est abandonnée
+    avant le retour, la QImage ne dépend donc d'aucun objet Pillow.
+
+    Args:
+        pil_image (PIL.Image.Image): Image RGBA.
+
+    Returns:
+        QImage: Image au format RGBA8888.
+    """
+    from PIL import Image
+
+    image = QImage(pil_image.width, pil_image.height, QImage.Format_RGBA8888)
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    view = Image.frombuffer("RGBA", pil_image.size, bits, "raw", "RGBA", image.bytesPerLine(), 1)
+    view.readonly = 0  # Le tampon de la QImage est modifiable : écrire dedans plutôt que dans une copie
+    view.paste(pil_image)
+    return image
+
+
+def logical_size(image):
+    """
+    Taille en pixels logiques (indépendants de l'écran) d'une QPixmap ou d'une QImage.
+    """
+    ratio = image.devicePixelRatio()
+    return QSize(math.ceil(image.width() / ratio), math.ceil(image.height() / ratio))
+
+
+def alpha_mask(image, threshold):
+    """
+    Masque 1 bit des pixels d'une image dont l'alpha dépasse un seuil (coûteux pour une
+    grande image, mais utilisable dans un thread de traitement).
+
+    Args:
+        image (QImage): Image RGBA.
+        threshold (int): Alpha au-dessous duquel (inclus) un pixel est exclu du masque.
+
+    Returns:
+        tuple: (QSize, bytes) : lignes complétées à l'octet, le format attendu par QBitmap.fromData.
+    """
+    from PIL import Image
+
+    alpha = image.convertToFormat(QImage.Format_Alpha8)
+    bits = alpha.constBits()
+    bits.setsize(alpha.sizeInBytes())
+    mask = Image.frombuffer("L", (alpha.width(), alpha.height()), bits, "raw", "L", alpha.bytesPerLine(), 1)
+    mask = mask.point([0] * (threshold + 1) + [255] * (255 - threshold), "1")
+    return alpha.size(), mask.tobytes()
+
+
+def mask_region(mask, device_pixel_ratio=1.0):
+    """
+    Région d'un masque calculé par alpha_mask, en pixels logiques.
+    """
+    size, bits = mask
+    region = QRegion(QBitmap.fromData(size, bits, QImage.Format_Mono))
+    if device_pixel_ratio != 1:
+        region = QTransform.fromScale(1 / device_pixel_ratio, 1 / device_pixel_ratio).map(region)
+    return region
+
+
+def file_digest(path):
+    """
+    Empreinte SHA-1 du contenu d'un fichier.
+    """
+    with open(path, "rb") as source:
+        return hashlib.sha1(source.read())
+
+
+class Instrumentation:
+    """
+    Mesure optionnelle (désactivée par défaut) des étapes coûteuses du rendu :
+    décodage PNG, transparence, contraste/luminosité, transformations, mise en page.
+
+    Chaque rendu produit un enregistrement (durée totale, événements reçus depuis le
+    rendu précédent, durée de chaque étape), consultable à l'écran ou enregistré en
+    JSON Lines pour une analyse hors ligne.
+    """
+
+    MAX_RECORDS = 100000  # Nombre maximal d'enregistrements conservés
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = deque(maxlen=self.MAX_RECORDS)
+        self.events = 0  # Événements souris / clavier reçus depuis le dernier rendu
+        self.on_frame = None  # Fonction appelée avec chaque nouvel enregistrement
+        self._depth = 0
+        self._stages = {}
+        self._open_stages = set()  # Étapes en cours de mesure
+        self._frame_start = 0.0
+
+    def count_event(self):
+        if self.enabled:
+            self.events += 1
+
+    def stage(self, name):
+        '''
+        Contexte mesurant une étape du rendu en cours (sans effet si la mesure est désactivée,
+        ou dans les threads de traitement en arrière-plan, qui ne font partie d'aucun rendu).
+        '''
+        if self.enabled and threading.current_thread() is threading.main_thread():
+            return self._timed_stage(name)
+        return nullcontext()
+
+    def frame(self, name):
+        '''
+        Contexte délimitant un rendu ; les rendus imbriqués sont comptés dans le rendu englobant.
+        '''
+        return self._timed_frame(name) if self.enabled else nullcontext()
+
+    def dump(self, path):
+        '''
+        Enregistre les mesures au format JSON Lines (un rendu par ligne).
+        '''
+        with open(path, "w", encoding="utf-8") as log:
+            for record in self.records:
+                log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def _timed_stage(self, name):
+        if name in self._open_stages:
+            # Étape imbriquée dans une étape de même nom : déjà comptée par l'étape englobante
+            yield
+            return
+        self._open_stages.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._open_stages.discard(name)
+            self._stages[name] = self._stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    @contextmanager
+    def _timed_frame(self, name):
+        self._depth += 1
+        if self._depth == 1:
+            self._stages = {}
+            self._frame_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                record = {
+                    "time": time.time(),
+                    "frame": name,
+                    "frame_ms": round((time.perf_counter() - self._frame_start) * 1000, 3),
+                    "events": self.events,
+                    "stages": {stage: round(ms, 3) for stage, ms in self._stages.items()},
+                }
+                self.events = 0
+                self.records.append(record)
+                if self.on_frame:
+                    self.on_frame(record)
+
+
+def timed_frame(name):
+    """
+    Décorateur : mesure une méthode de TransparentWindow comme un rendu complet.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.frame(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_stage(name):
+    """
+    Décorateur : mesure une méthode de TransparentWindow comme une étape du rendu en cours.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InputTrace(QObject):
+    """
+    Enregistrement des événements souris et clavier reçus par la fenêtre, horodatés, pour
+    rejouer un geste réel à l'identique (voir `benchmark.py --trace`).
+
+    Format : une signature, une ligne JSON d'en-tête (mode et état des outils au début de
+    l'enregistrement), puis un enregistrement binaire de taille fixe par événement. Les
+    changements de mode, faits depuis la liste déroulante, sont enregistrés comme des
+    pseudo-événements.
+    """
+
+    MAGIC = b"GMQT1\n"
+    RECORD = struct.Struct("<dB4i4I")  # Temps, type, position, position globale, bouton, boutons, modificateurs, touche
+    MODE = 0  # Pseudo-type d'événement : changement de mode (touche = index dans TransparentWindow.TOOL_MODES)
+    EVENT_TYPES = (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseMove, QEvent.KeyPress,
+                   QEvent.KeyRelease)
+
+    def __init__(self, header, parent=None):
+        '''
+        Args:
+            header (dict): État de la fenêtre au début de l'enregistrement.
+            parent (QObject): Parent Qt.
+        '''
+        super().__init__(parent)
+        self.header = header
+        self.data = bytearray()
+        self.start = time.perf_counter()
+
+    def eventFilter(self, watched, event):
+        if event.type() in self.EVENT_TYPES:
+            self.record(event)
+        return False  # L'événement est seulement observé
+
+    def record(self, event):
+        elapsed = time.perf_counter() - self.start
+        if isinstance(event, QMouseEvent):
+            pos, global_pos = event.pos(), event.globalPos()
+            self.data += self.RECORD.pack(
+                elapsed, event.type(), pos.x(), pos.y(), global_pos.x(), global_pos.y(),
+                int(event.button()), int(event.buttons()), int(event.modifiers()), 0,
+            )
+        else:
+            self.data += self.RECORD.pack(elapsed, event.type(), 0, 0, 0, 0, 0, 0, int(event.modifiers()), event.key())
+
+    def record_mode(self, index):
+        self.data += self.RECORD.pack(time.perf_counter() - self.start, self.MODE, 0, 0, 0, 0, 0, 0, 0, index)
+
+    def save(self, path):
+        with open(path, "wb") as trace:
+            trace.write(self.MAGIC)
+            trace.write(json.dumps(self.header, ensure_ascii=False).encode("utf-8") + b"\n")
+            trace.write(self.data)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Lit un enregistrement.
+
+        Returns:
+            tuple: (en-tête, liste de (temps en secondes, événement Qt ou index de mode)).
+        '''
+        with open(path, "rb") as trace:
+            if trace.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"{path} n'est pas un enregistrement d'événements")
+            header = json.loads(trace.readline())
+            data = trace.read()
+        events = []
+        for elapsed, kind, x, y, global_x, global_y, button, buttons, modifiers, key in cls.RECORD.iter_unpack(data):
+            if kind == cls.MODE:
+                events.append((elapsed, key))
+            elif kind in (QEvent.KeyPress, QEvent.KeyRelease):
+                events.append((elapsed, QKeyEvent(kind, key, Qt.KeyboardModifiers(modifiers))))
+            else:
+                events.append((elapsed, QMouseEvent(
+                    kind, QPointF(x, y), QPointF(x, y), QPointF(global_x, global_y), Qt.MouseButton(button),
+                    Qt.MouseButtons(buttons), Qt.KeyboardModifiers(modifiers),
+                )))
+        return header, events
+
+
+class AssetCache:
+    """
+    Cache des outils déjà traités (transparence + contraste + luminosité).
+
+    Les QPixmap finales sont conservées en mémoire, indexées par outil et paramètres
+    de traitement. Si un répertoire est fourni, les pixels RGBA traités sont aussi
+    enregistrés sur disque, indexés par une empreinte du fichier source et des
+    paramètres : les lancements suivants n'ont plus besoin de décoder le PNG.
+    """
+
+    MAGIC = b"GMQ1"
+    HEADER = struct.Struct("<4sII")  # Signature, largeur, hauteur
+
+    def __init__(self, cache_dir=None, pack=None):
+        '''
+        Args:
+            cache_dir (str | None): Répertoire de persistance, ou None pour un cache uniquement en mémoire.
+            pack (AssetPack | None): Paquet précompilé consulté avant le cache disque.
+        '''
+        self.cache_dir = cache_dir
+        self.pack = pack
+        self._pixmaps = {}
+
+    def get(self, key, path, params, build):
+        '''
+        Retourne la QPixmap traitée d'un outil, en la construisant au besoin.
+
+        Args:
+            key (str): Nom de l'outil.
+            path (str): Chemin du PNG source.
+            params (tuple): Paramètres de traitement (font partie de la clé du cache).
+            build (callable): Fonction `build(path) -> QImage` appelée si l'outil n'est pas en cache.
+
+        Returns:
+            QPixmap: Image traitée.
+        '''
+        pixmap = self.lookup(key, path, params)
+        if pixmap is None:
+            pixmap = self.store(key, path, params, build(path))
+        return pixmap
+
+    def lookup(self, key, path, params):
+        '''
+        Retourne la QPixmap traitée d'un outil si elle est disponible sans décoder le PNG
+        (mémoire, paquet précompilé ou cache disque), None sinon.
+        '''
+        memory_key = (key, path, params)
+        pixmap = self._pixmaps.get(memory_key)
+        if pixmap is not None:
+            return pixmap
+
+        # Paquet précompilé (projeté en mémoire), puis cache disque
+        image = self.pack.image(key, path, params) if self.pack else None
+        if image is None:
+            disk_path = self._disk_path(path, params)
+            image = self._read(disk_path) if disk_path else None
+        if image is None:
+            return None
+
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[memory_key] = pixmap
+        return pixmap
+
+    def store(self, key, path, params, image):
+        '''
+        Ajoute l'image traitée d'un outil au cache (mémoire, et disque si un répertoire est fourni).
+
+        Returns:
+            QPixmap: Image traitée.
+        '''
+        disk_path = self._disk_path(path, params)
+        if disk_path:
+            self._write(disk_path, image)
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[(key, path, params)] = pixmap
+        return pixmap
+
+    def clear(self):
+        '''
+        Vide le cache mémoire (le cache disque est conservé).
+        '''
+        self._pixmaps.clear()
+
+    def discard(self, key):
+        '''
+        Retire de la mémoire toutes les versions d'un outil.
+        '''
+        self._pixmaps = {memory_key: pixmap for memory_key, pixmap in self._pixmaps.items() if memory_key[0] != key}
+
+    def memory_bytes(self):
+        return sum(FrameCache.pixmap_bytes(pixmap) for pixmap in self._pixmaps.values())
+
+    def _disk_path(self, path, params):
+        if not self.cache_dir:
+            return None
+        try:
+            digest = file_digest(path)
+        except OSError:
+            return None
+        digest.update(repr(params).encode("utf-8"))
+        return os.path.join(self.cache_dir, digest.hexdigest() + ".rgba")
+
+    def _read(self, disk_path):
+        try:
+            with open(disk_path, "rb") as cached:
+                header = cached.read(self.HEADER.size)
+                if len(header) < self.HEADER.size:
+                    return None
+                magic, width, height = self.HEADER.unpack(header)
+                if magic != self.MAGIC or os.fstat(cached.fileno()).st_size != self.HEADER.size + width * height * 4:
+                    return None
+                # Les pixels sont lus directement dans la mémoire de la QImage
+                image = QImage(width, height, QImage.Format_RGBA8888)
+                pixels = image.bits()
+                pixels.setsize(image.sizeInBytes())
+                if cached.readinto(pixels) != image.sizeInBytes():
+                    return None
+        except OSError:
+            return None
+        return image
+
+    def _write(self, disk_path, image):
+        # Le cache disque est facultatif : une erreur d'écriture (dossier en lecture seule...) est ignorée
+        image = image.convertToFormat(QImage.Format_RGBA8888)
+        pixels = image.constBits()
+        pixels.setsize(image.sizeInBytes())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary_path = disk_path + ".tmp"
+            with open(temporary_path, "wb") as cached:
+                cached.write(self.HEADER.pack(self.MAGIC, image.width(), image.height()))
+                cached.write(pixels)
+            os.replace(temporary_path, disk_path)
+        except OSError:
+            pass
+
+
+class AssetPack:
+    """
+    Paquet précompilé des outils déjà traités, projeté en mémoire (mmap) au lancement.
+
+    Les pixels sont stockés au format natif des QPixmap (ARGB32 prémultiplié) et
+    enveloppés directement dans des QImage : aucun décodage PNG ni traitement n'est
+    nécessaire. Un outil est ignoré (retour au PNG) si le paquet a été construit avec
+    d'autres paramètres ou à partir d'un autre fichier source.
+
+    Format : signature, longueur de l'en-tête (uint32), en-tête JSON (paramètres,
+    puis taille, empreinte et position des pixels de chaque outil), pixels alignés sur 16 octets.
+    """
+
+    MAGIC = b"GMQP"
+    LENGTH = struct.Struct("<I")
+    ALIGNMENT = 16
+    FORMAT = QImage.Format_ARGB32_Premultiplied
+
+    def __init__(self, path):
+        '''
+        Args:
+            path (str): Chemin du paquet. Un paquet absent ou illisible est simplement ignoré.
+        '''
+        self.path = path
+        self.params = None
+        self.tools = {}
+        self._map = None
+        self._data_start = 0
+        try:
+            with open(path, "rb") as pack:
+                self._map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_header()
+        except (OSError, ValueError):
+            self.close()
+
+    def _read_header(self):
+        prefix = len(self.MAGIC) + self.LENGTH.size
+        if self._map[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError("Signature de paquet invalide")
+        (length,) = self.LENGTH.unpack_from(self._map, len(self.MAGIC))
+        header = json.loads(self._map[prefix:prefix + length].decode("utf-8"))
+        self.params = header["params"]
+        self.tools = header["tools"]
+        self._data_start = self._align(prefix + length)
+        for entry in self.tools.values():
+            if self._data_start + entry["offset"] + entry["height"] * entry["stride"] > len(self._map):
+                raise ValueError("Paquet tronqué")
+
+    @classmethod
+    def _align(cls, position):
+        return -(-position // cls.ALIGNMENT) * cls.ALIGNMENT
+
+    @property
+    def available(self):
+        return self._map is not None
+
+    def image(self, key, source_path, params):
+        '''
+        Retourne l'image traitée d'un outil, sans copie, ou None si le paquet ne convient pas.
+
+        Args:
+            key (str): Nom de l'outil.
+            source_path (str): PNG source : s'il existe, son empreinte doit correspondre à celle du paquet.
+            params (tuple): Paramètres de traitement attendus.
+
+        Returns:
+            QImage | None: Image adossée à la projection mémoire (valide tant que le paquet est ouvert).
+        '''
+        entry = self.tools.get(key)
+        if not self.available or entry is None or self.params != list(params):
+            return None
+        if os.path.exists(source_path):
+            try:
+                if file_digest(source_path).hexdigest() != entry["sha1"]:
+                    return None
+            except OSError:
+                return None
+        start = self._data_start + entry["offset"]
+        pixels = sip.voidptr(memoryview(self._map)[start:start + entry["height"] * entry["stride"]])
+        return QImage(pixels, entry["width"], entry["height"], entry["stride"], self.FORMAT)
+
+    def size(self, key):
+        '''
+        Taille d'un outil lue dans l'en-tête du paquet (les outils y sont en pleine résolution).
+
+        Returns:
+            QSize: Taille de l'outil, invalide s'il n'est pas dans le paquet.
+        '''
+        entry = self.tools.get(key)
+        return QSize(entry["width"], entry["height"]) if entry else QSize()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self.tools = {}
+
+    @classmethod
+    def build(cls, path, tools, params):
+        '''
+        Écrit un paquet à partir des images traitées des outils.
+
+        Args:
+            path (str): Chemin du paquet à écrire.
+            tools (dict): Nom de l'outil -> (chemin du PNG source, QImage traitée).
+            params (tuple): Paramètres de traitement utilisés.
+        '''
+        entries, blobs, offset = {}, [], 0
+        for key, (source_path, image) in tools.items():
+            image = image.convertToFormat(cls.FORMAT)
+            blob = image.constBits().asstring(image.sizeInBytes())
+            entries[key] = {
+                "sha1": file_digest(source_path).hexdigest(),
+                "width": image.width(),
+                "height": image.height(),
+                "stride": image.bytesPerLine(),
+                "offset": offset,
+            }
+            blobs.append(blob)
+            offset = cls._align(offset + len(blob))
+
+        header = json.dumps({"params": list(params), "tools": entries}).encode("utf-8")
+        prefix = len(cls.MAGIC) + cls.LENGTH.size
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as pack:
+            pack.write(cls.MAGIC + cls.LENGTH.pack(len(header)) + header)
+            pack.write(b"\0" * (cls._align(prefix + len(header)) - prefix - len(header)))
+            for blob in blobs:
+                pack.write(blob)
+                pack.write(b"\0" * (cls._align(len(blob)) - len(blob)))
+        os.replace(temporary_path, path)
+
+
+class FrameCache:
+    """
+    Cache LRU, borné en mémoire, des images déjà rendues d'un outil (angle et zoom donnés)
+    et des images composites de deux outils.
+
+    Les angles et les zooms sont quantifiés pour que les allers-retours autour des
+    mêmes positions (0°, 90°, petits pas de 1°...) retrouvent les images déjà calculées.
+    """
+
+    ANGLE_STEP = 0.25  # Pas de quantification des angles, en degrés
+    SCALE_DIGITS = 3  # Nombre de décimales conservées pour le zoom
+    COMPOSITE = "composite"  # Clé d'une composite : (COMPOSITE, clé de l'image 1, clé de l'image 2)
+
+    def __init__(self, max_bytes):
+        '''
+        Args:
+            max_bytes (int): Budget mémoire maximal des images conservées, en octets.
+        '''
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()  # Clé -> QPixmap, de la moins à la plus récemment utilisée
+
+    @classmethod
+    def quantize_angle(cls, angle):
+        return round((angle % 360) / cls.ANGLE_STEP) * cls.ANGLE_STEP % 360
+
+    @classmethod
+    def quantize_scale(cls, scale):
+        return round(scale, cls.SCALE_DIGITS)
+
+    def __contains__(self, key):
+        return key in self._frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, key):
+        '''
+        Retourne l'image associée à la clé (et la marque comme récemment utilisée), ou None.
+        '''
+        pixmap = self._frames.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._frames.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        '''
+        Ajoute une image, en supprimant les moins récemment utilisées si le budget est dépassé.
+        '''
+        size = self.pixmap_bytes(pixmap)
+        if size > self.max_bytes:
+            return
+        if key in self._frames:
+            self.bytes -= self.pixmap_bytes(self._frames.pop(key))
+        while self._frames and self.bytes + size > self.max_bytes:
+            _, evicted = self._frames.popitem(last=False)
+            self.bytes -= self.pixmap_bytes(evicted)
+        self._frames[key] = pixmap
+        self.bytes += size
+
+    def clear(self):
+        self._frames.clear()
+        self.bytes = 0
+
+    def trim(self, max_bytes):
+        '''
+        Supprime les images les moins récemment utilisées jusqu'à occuper au plus `max_bytes`.
+        '''
+        while self._frames and self.bytes > max_bytes:
+            _, evicted = self._frames.popitem(last=False)
+            self.bytes -= self.pixmap_bytes(evicted)
+
+    def discard(self, tool):
+        '''
+        Supprime les images rendues d'un outil, et les composites qui le contiennent.
+        '''
+        for key in [key for key in self._frames
+                    if key[0] == tool or key[0] == self.COMPOSITE and tool in (key[1][0], key[2][0])]:
+            self.bytes -= self.pixmap_bytes(self._frames.pop(key))
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class RenderTarget:
+    """
+    Surface de rendu réutilisée : les aperçus successifs d'un geste sont peints avec
+    QPainter dans la même QImage, au lieu d'allouer une nouvelle image par rendu.
+
+    La QImage n'est réallouée que si le rendu demandé la dépasse, et elle grandit alors
+    d'au moins GROWTH : un zoom continu ne la réalloue qu'en quelques paliers. Elle est
+    réduite si le rendu devient beaucoup plus petit (zoom arrière), et peut être réservée
+    d'avance pour toutes les rotations d'un outil. Seule la partie `rect` contient le
+    dernier rendu.
+    """
+
+    STEP = 128  # Arrondi de la taille allouée, en pixels
+    GROWTH = 1.5  # Agrandissement minimal de chaque côté quand l'image est réallouée plus grande
+    SHRINK_RATIO = 4  # Surface allouée, en multiple de la surface utilisée, au-delà de laquelle l'image est réduite
+    MAX_RESERVED_PIXELS = 4096 * 4096  # Au-delà, pas de réserve (rotations, paliers d'agrandissement)
+
+    def __init__(self):
+        self.image = QImage()
+        self.rect = QRect()  # Partie de l'image occupée par le dernier rendu, en pixels physiques
+        self.allocations = 0
+
+    def reserve(self, size, shrink=True):
+        '''
+        Garantit une image d'au moins `size` pixels, en ne la réallouant qu'au besoin.
+
+        Args:
+            size (QSize): Taille minimale, en pixels physiques.
+            shrink (bool): Réduire l'image si elle est beaucoup plus grande que nécessaire.
+        '''
+        image = self.image
+        width, height = size.width(), size.height()
+        if image.width() < width or image.height() < height:
+            # Agrandie sans réduire l'autre côté : une rotation ne fait qu'alterner largeur et hauteur
+            grown = QSize(math.ceil(image.width() * self.GROWTH), math.ceil(image.height() * self.GROWTH))
+            if grown.width() * grown.height() > self.MAX_RESERVED_PIXELS:
+                grown = image.size()
+            width, height = max(width, grown.width()), max(height, grown.height())
+        elif not shrink or self._rounded(width) * self._rounded(height) * self.SHRINK_RATIO >= image.width() * image.height():
+            return
+        self.image = QImage(self._rounded(width), self._rounded(height), QImage.Format_ARGB32_Premultiplied)
+        self.allocations += 1
+
+    def _rounded(self, side):
+        return -(-max(1, side) // self.STEP) * self.STEP
+
+    def release(self):
+        '''
+        Libère l'image : elle sera réallouée au prochain aperçu.
+        '''
+        self.image = QImage()
+        self.rect = QRect()
+
+    def reserve_rotations(self, width, height):
+        '''
+        Réserve une image couvrant toutes les rotations d'un rendu de `width` x `height`
+        pixels : tourner l'outil ne réalloue plus l'image, tant qu'elle reste raisonnable.
+        '''
+        side = math.ceil(math.hypot(width, height)) + 1
+        if side * side <= self.MAX_RESERVED_PIXELS:
+            self.reserve(QSize(side, side))
+
+    def begin(self, size, device_pixel_ratio=1.0):
+        '''
+        Prépare un nouveau rendu de `size` pixels physiques : la zone est effacée.
+
+        Returns:
+            QPainter: Peintre actif sur l'image ; l'appelant le termine avec end().
+        '''
+        self.reserve(size, shrink=False)
+        self.image.setDevicePixelRatio(device_pixel_ratio)
+        self.rect = QRect(QPoint(0, 0), size)
+        painter = QPainter(self.image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(self.rect, Qt.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        return painter
+
+    def paint_pixmap(self, pixmap, transform, mode=Qt.FastTransformation, device_pixel_ratio=1.0):
+        '''
+        Peint une image transformée, avec la même taille et la même position que
+        QPixmap.transformed(transform, mode).
+        '''
+        size = transform.mapRect(QRectF(pixmap.rect())).toAlignedRect().size()
+        painter = self.begin(size, device_pixel_ratio)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, mode == Qt.SmoothTransformation)
+        painter.setTransform(QPixmap.trueMatrix(transform, pixmap.width(), pixmap.height()))
+        painter.drawPixmap(0, 0, pixmap)
+        painter.end()
+
+    # Même interface que QPixmap pour logical_size : taille du dernier rendu
+    def devicePixelRatio(self):
+        return self.image.devicePixelRatio()
+
+    def width(self):
+        return self.rect.width()
+
+    def height(self):
+        return self.rect.height()
+
+    def memory_bytes(self):
+        return self.image.sizeInBytes()
+
+
+class ToolState:
+    """
+    Transformation d'un outil : position, angle et zoom.
+
+    C'est la seule source de vérité pour tous les chemins de rendu ; chaque image
+    affichée est calculée à partir de cet état et de l'image traitée de l'outil.
+    """
+    __slots__ = ("key", "pos", "angle", "scale")
+
+    def __init__(self, key, pos=None, angle=0.0, scale=1.0):
+        self.key = key
+        self.pos = pos if pos is not None else QPoint(0, 0)  # Coin supérieur gauche de l'outil affiché
+        self.angle = angle
+        self.scale = scale
+
+    def frame_key(self, device_pixel_ratio=1.0):
+        '''
+        Clé de l'image rendue dans le cache : (outil, angle quantifié, zoom quantifié, ratio de l'écran).
+        '''
+        return (self.key, FrameCache.quantize_angle(self.angle), FrameCache.quantize_scale(self.scale),
+                device_pixel_ratio)
+
+
+class HitMask:
+    """
+    Masque de sélection d'un outil : version réduite de son canal alpha, seuillée.
+
+    Les zones entourées par les traits de l'outil (le corps blanc, presque transparent,
+    d'un rapporteur ou d'une équerre) font partie de l'outil : seules les cellules vides
+    reliées au bord de l'image laissent passer les clics.
+
+    Le masque est exprimé dans le repère de l'outil non transformé. Pour tester un clic, on
+    ramène le point dans ce repère par l'inverse de la rotation et du zoom de l'outil : un
+    test coûte une seule lecture, quelle que soit la taille de l'outil, et tourner ou zoomer
+    l'outil ne demande pas de recalculer le masque.
+    """
+
+    SIZE = 256  # Plus grand côté visé, en cellules
+    GRAB_RADIUS = 1  # Marge de prise autour des traits de l'outil, en cellules
+
+    def __init__(self, image, threshold, full_size):
+        '''
+        Args:
+            image (QImage): Image traitée de l'outil, à n'importe quelle résolution.
+            threshold (int): Alpha au-dessous duquel (inclus) un pixel laisse passer les clics.
+            full_size (QSize): Taille d'origine de l'outil, repère des coordonnées testées.
+        '''
+        # Uniquement des opérations Qt et Python : pas de Pillow au démarrage
+        alpha = image.convertToFormat(QImage.Format_Alpha8)
+        self.width, self.height = alpha.width(), alpha.height()
+        bits = alpha.constBits()
+        bits.setsize(alpha.sizeInBytes())
+        stride = alpha.bytesPerLine()
+        cells = b"".join(bytes(bits[row * stride:row * stride + self.width]) for row in range(self.height))
+        # Cellules de l'outil à 1, cellules vides à 0
+        cells = cells.translate(bytes(0 if value <= threshold else 1 for value in range(256)))
+        self.bits = self._dilate(self._fill_enclosed(cells), self.GRAB_RADIUS)
+        self.scale_x = self.width / full_size.width()
+        self.scale_y = self.height / full_size.height()
+
+    def _fill_enclosed(self, cells):
+        '''
+        Marque comme pleines les cellules vides qui ne sont pas reliées au bord (remplissage
+        par segments horizontaux depuis les cellules vides du bord).
+        '''
+        width, height = self.width, self.height
+        blocked = bytearray(cells)  # Cellules pleines ou déjà atteintes depuis le bord
+        outside = bytearray(len(cells))
+        border = [(x, 0) for x in range(width)] + [(x, height - 1) for x in range(width)]
+        border += [(0, y) for y in range(height)] + [(width - 1, y) for y in range(height)]
+        stack = [y * width + x for x, y in border]
+        while stack:
+            index = stack.pop()
+            if blocked[index]:
+                continue
+            row = index - index % width
+            start = blocked.rfind(1, row, index) + 1 or row
+            end = blocked.find(1, index, row + width)
+            if end < 0:
+                end = row + width
+            blocked[start:end] = b"\1" * (end - start)
+            outside[start:end] = b"\1" * (end - start)
+            # Cellules vides des segments voisins, au-dessus et au-dessous
+            for neighbour in (start - width, start + width):
+                if not 0 <= neighbour < len(cells):
+                    continue
+                position, stop = neighbour, neighbour + end - start
+                while position < stop:
+                    position = blocked.find(0, position, stop)
+                    if position < 0:
+                        break
+                    stack.append(position)
+                    position = blocked.find(1, position, stop)
+                    if position < 0:
+                        break
+        return outside.translate(bytes([1, 0]) + bytes(254))
+
+    def _dilate(self, cells, radius):
+        '''
+        Élargit les cellules pleines de `radius` cellules (marge de prise), par décalages d'un
+        entier contenant toute la grille (un octet par cellule) : une colonne vide ajoutée à
+        chaque ligne, remise à zéro à chaque passe, empêche une ligne de déborder sur la suivante.
+        '''
+        width = self.width + 1
+        padded = b"".join(cells[row * self.width:(row + 1) * self.width] + b"\0" for row in range(self.height))
+        size = len(padded)
+        grid = int.from_bytes(padded, "big")
+        keep = int.from_bytes((b"\xff" * self.width + b"\0") * self.height, "big")
+        for _ in range(radius):
+            grid |= (grid << 8) | (grid >> 8)
+            grid |= (grid << 8 * width) | (grid >> 8 * width)
+            grid &= keep
+        padded = grid.to_bytes(size, "big")
+        return b"".join(padded[row * width:row * width + self.width] for row in range(self.height))
+
+    def contains(self, x, y):
+        '''
+        Indique si le point (x, y), dans le repère de l'outil à sa taille d'origine, est sur l'outil.
+        '''
+        column = math.floor(x * self.scale_x)
+        row = math.floor(y * self.scale_y)
+        return 0 <= column < self.width and 0 <= row < self.height and self.bits[row * self.width + column] != 0
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class SpatialGrid:
+    """
+    Index spatial des outils affichés : grille de cellules carrées, chacune listant les
+    outils dont le rectangle englobant la touche.
+
+    Un clic ou une recherche de chevauchement ne consulte que les outils des cellules
+    concernées, quel que soit le nombre d'outils à l'écran.
+    """
+
+    CELL = 128  # Côté d'une cellule, en pixels
+
+    def __init__(self, cell=CELL):
+        self.cell = cell
+        self.cells = {}  # (colonne, ligne) -> noms des outils
+        self.rects = {}  # Nom de l'outil -> QRect indexé
+
+    def update(self, name, rect):
+        '''
+        Indexe (ou réindexe) un outil avec son rectangle englobant.
+        '''
+        if self.rects.get(name) == rect:
+            return
+        self.remove(name)
+        self.rects[name] = QRect(rect)
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, set()).add(name)
+
+    def remove(self, name):
+        rect = self.rects.pop(name, None)
+        if rect is None:
+            return
+        for cell in self._cells(rect):
+            names = self.cells[cell]
+            names.discard(name)
+            if not names:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells = {}
+        self.rects = {}
+
+    def at(self, pos):
+        '''
+        Noms des outils dont le rectangle contient `pos`.
+        '''
+        names = self.cells.get((pos.x() // self.cell, pos.y() // self.cell), ())
+        return [name for name in names if self.rects[name].contains(pos)]
+
+    def overlapping(self, rect):
+        '''
+        Noms des outils dont le rectangle chevauche `rect`.
+        '''
+        names = set()
+        for cell in self._cells(rect):
+            names.update(self.cells.get(cell, ()))
+        return [name for name in names if self.rects[name].intersects(rect)]
+
+    def bounds(self):
+        '''
+        Rectangle englobant tous les outils indexés (vide s'il n'y en a aucun).
+        '''
+        bounds = QRect()
+        for rect in self.rects.values():
+            bounds = bounds.united(rect)
+        return bounds
+
+    def _cells(self, rect):
+        for column in range(rect.left() // self.cell, rect.right() // self.cell + 1):
+            for row in range(rect.top() // self.cell, rect.bottom() // self.cell + 1):
+                yield column, row
+
+
+class MipmapPyramid:
+    """
+    Pyramide de versions réduites d'une image traitée (1, 1/2, 1/4...).
+
+    Chaque zoom est rééchantillonné à partir du plus petit niveau qui reste au moins
+    aussi grand que la taille demandée : le rendu dézoomé est moins coûteux et plus net,
+    et zoomer ne relit jamais le PNG.
+
+    Le niveau 0 peut être une version déjà réduite de l'outil (décodage à résolution
+    réduite) : les zooms restent exprimés par rapport à la taille d'origine `full_size`.
+    """
+
+    MIN_SIZE = 32  # Plus petit côté, en pixels, du dernier niveau
+
+    def __init__(self, pixmap, full_size=None, hit_threshold=0):
+        '''
+        Args:
+            pixmap (QPixmap): Image traitée (niveau 0).
+            full_size (QSize | None): Taille d'origine de l'outil, si le niveau 0 est réduit.
+            hit_threshold (int): Alpha au-dessous duquel (inclus) un pixel laisse passer les clics.
+        '''
+        self.full_size = full_size if full_size is not None else pixmap.size()
+        self.levels = [pixmap]
+        while min(self.levels[-1].width(), self.levels[-1].height()) // 2 >= self.MIN_SIZE:
+            previous = self.levels[-1]
+            self.levels.append(previous.scaled(
+                previous.width() // 2, previous.height() // 2, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+            ))
+        self.hit_threshold = hit_threshold
+        self._hit_mask = None
+
+    @property
+    def hit_mask(self):
+        '''
+        Masque de sélection, calculé au premier clic depuis le niveau le plus proche de sa taille.
+        '''
+        if self._hit_mask is None:
+            mask_scale = HitMask.SIZE / max(self.width(), self.height())
+            self._hit_mask = HitMask(self.level_for(mask_scale).toImage(), self.hit_threshold, self.full_size)
+        return self._hit_mask
+
+    def width(self):
+        return self.full_size.width()
+
+    def memory_bytes(self):
+        levels = sum(FrameCache.pixmap_bytes(level) for level in self.levels[1:])  # Le niveau 0 est dans AssetCache
+        return levels + (self._hit_mask.memory_bytes() if self._hit_mask else 0)
+
+    def height(self):
+        return self.full_size.height()
+
+    def level_for(self, scale):
+        '''
+        Retourne le plus petit niveau dont la largeur reste >= à la largeur demandée.
+
+        Args:
+            scale (float): Facteur de zoom par rapport au niveau 0.
+
+        Returns:
+            QPixmap: Niveau de la pyramide.
+        '''
+        target_width = self.width() * scale
+        index = 0
+        while index + 1 < len(self.levels) and self.levels[index + 1].width() >= target_width:
+            index += 1
+        return self.levels[index]
+
+    def transformed(self, angle, scale, mode=Qt.SmoothTransformation):
+        '''
+        Retourne l'image tournée et zoomée, calculée depuis le niveau le plus proche.
+
+        La rotation et le reste du zoom sont combinés en une seule transformation
+        affine : l'image n'est rééchantillonnée qu'une fois.
+
+        Args:
+            angle (float): Angle de rotation, en degrés.
+            scale (float): Facteur de zoom par rapport au niveau 0.
+            mode (Qt.TransformationMode): Qualité du rééchantillonnage.
+
+        Returns:
+            QPixmap: Image rendue.
+        '''
+        level, transform = self.level_transform(angle, scale)
+        if transform is None:
+            return level
+        return level.transformed(transform, mode)
+
+    def level_transform(self, angle, scale):
+        '''
+        Niveau de départ et transformation affine d'un rendu (voir transformed).
+
+        Returns:
+            tuple: (QPixmap, QTransform | None) : None si le niveau convient tel quel.
+        '''
+        level = self.level_for(scale)
+        residual = scale * self.width() / level.width()
+        if angle % 360 == 0 and residual == 1:
+            return level, None
+        return level, QTransform().rotate(angle).scale(residual, residual)
+
+
+class VectorTool:
+    """
+    Outil dessiné par des tracés vectoriels plutôt que par son PNG.
+
+    Les tracés (corps, contours, graduations, textes) sont construits une seule fois, dans
+    le repère de l'outil à sa taille d'origine, puis peints directement à l'angle et au zoom
+    demandés : aucun rééchantillonnage, et les graduations restent nettes à tout zoom.
+    Les sous-classes décrivent la forme de l'outil dans `build`.
+    """
+
+    WIDTH, HEIGHT = 0, 0  # Taille d'origine, identique à celle du PNG correspondant
+    PX_PER_MM = 4.2  # Échelle des graduations, identique à celle des PNG
+    BODY_COLOR = QColor(255, 255, 255, 40)
+    LINE_COLOR = QColor(30, 30, 30)
+    LINE_WIDTH = 1.0
+    FONT_FAMILY = "Arial"
+
+    def __init__(self):
+        self.body = QPainterPath()  # Surface de l'outil, remplie
+        self.lines = QPainterPath()  # Contours, tracés
+        self.ticks = []  # Graduations : segments QLineF, tracés en un seul appel (bien plus rapide qu'un tracé)
+        self.labels = QPainterPath()  # Textes, convertis en tracés et remplis
+        self.build()
+        self._pixmap = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def size(self):
+        return QSize(self.WIDTH, self.HEIGHT)
+
+    def pixmap(self):
+        '''
+        Image de l'outil sans rotation ni zoom (niveau 0 de sa pyramide), calculée une seule fois.
+        '''
+        if self._pixmap is None:
+            self._pixmap = QPixmap.fromImage(self.render(0, 1))
+        return self._pixmap
+
+    def render_size(self, angle, scale):
+        '''
+        Taille, en pixels, de l'image de l'outil tourné et zoomé (son rectangle englobant).
+        '''
+        bounds = QTransform().rotate(angle).scale(scale, scale).mapRect(QRectF(0, 0, self.WIDTH, self.HEIGHT))
+        return QSize(max(1, round(bounds.width())), max(1, round(bounds.height())))
+
+    def render(self, angle, scale, smooth=True):
+        '''
+        Peint l'outil tourné et zoomé autour de son centre, dans une image à la taille de
+        son rectangle englobant (comme QPixmap.transformed).
+
+        Args:
+            angle (float): Angle de rotation, en degrés.
+            scale (float): Facteur de zoom, en pixels de l'image par pixel de l'outil.
+            smooth (bool): Antialiasing (désactivé pour les aperçus pendant un geste).
+
+        Returns:
+            QImage: Image rendue.
+        '''
+        image = QImage(self.render_size(angle, scale), QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        self.paint(painter, image.size(), angle, scale, smooth)
+        painter.end()
+        return image
+
+    def paint(self, painter, size, angle, scale, smooth=True):
+        '''
+        Peint l'outil tourné et zoomé au centre d'une zone de `size` pixels (voir render).
+        '''
+        painter.setRenderHint(QPainter.Antialiasing, smooth)
+        painter.translate(size.width() / 2, size.height() / 2)
+        painter.rotate(angle)
+        painter.scale(scale, scale)
+        painter.translate(-self.WIDTH / 2, -self.HEIGHT / 2)
+        painter.fillPath(self.body, self.BODY_COLOR)
+        pen = QPen(self.LINE_COLOR, self.LINE_WIDTH, Qt.SolidLine, Qt.FlatCap)
+        painter.strokePath(self.lines, pen)
+        painter.setPen(pen)
+        painter.drawLines(self.ticks)
+        painter.fillPath(self.labels, self.LINE_COLOR)
+
+    def add_tick(self, x1, y1, x2, y2):
+        self.ticks.append(QLineF(x1, y1, x2, y2))
+
+    def add_label(self, text, center, pixel_size, angle=0):
+        '''
+        Ajoute un texte centré sur `center`, tourné de `angle` degrés.
+        '''
+        font = QFont(self.FONT_FAMILY)
+        font.setPixelSize(pixel_size)
+        path = QPainterPath()
+        path.addText(0, 0, font, text)
+        middle = path.boundingRect().center()
+        transform = QTransform().translate(center.x(), center.y()).rotate(angle).translate(-middle.x(), -middle.y())
+        self.labels.addPath(transform.map(path))
+
+
+class VectorRuler(VectorTool):
+    """
+    Règle de 20 cm : graduations en millimètres sur les deux bords, la seconde à l'envers.
+    """
+
+    WIDTH, HEIGHT = 900, 158
+    LENGTH_MM = 200
+
+    def build(self):
+        self.body.addRoundedRect(QRectF(0, 0, self.WIDTH, self.HEIGHT), 8, 8)
+        self.lines.addRoundedRect(QRectF(0.5, 0.5, self.WIDTH - 1, self.HEIGHT - 1), 8, 8)
+        start = (self.WIDTH - self.LENGTH_MM * self.PX_PER_MM) / 2
+        for mm in range(self.LENGTH_MM + 1):
+            x = start + mm * self.PX_PER_MM
+            length = 16 if mm % 10 == 0 else 11 if mm % 5 == 0 else 7
+            self.add_tick(x, 0, x, length)
+            self.add_tick(x, self.HEIGHT, x, self.HEIGHT - length)
+            if mm % 10 == 0:
+                self.add_label(str(mm // 10), QPointF(x, 30), 15)
+                self.add_label(str(mm // 10), QPointF(self.WIDTH - x, self.HEIGHT - 30), 15, 180)
+
+
+class VectorSetSquare(VectorTool):
+    """
+    Équerre évidée, angle droit en bas à gauche, graduée en millimètres le long de sa base.
+    """
+
+    WIDTH, HEIGHT = 576, 288
+    BODY_COLOR = QColor(200, 190, 245, 170)
+    LINE_COLOR = QColor(90, 75, 160)
+    HOLE = ((78, 120), (78, 216), (285, 216))  # Évidement intérieur
+    GRADUATION_START = 10  # Abscisse du zéro
+
+    def build(self):
+        outline = QPainterPath()
+        outline.moveTo(0, 0)
+        outline.lineTo(0, self.HEIGHT)
+        outline.lineTo(self.WIDTH, self.HEIGHT)
+        outline.closeSubpath()
+        hole = QPainterPath()
+        hole.moveTo(*self.HOLE[0])
+        for point in self.HOLE[1:]:
+            hole.lineTo(*point)
+        hole.closeSubpath()
+        self.body = outline.subtracted(hole)
+        self.lines.addPath(outline)
+        self.lines.addPath(hole)
+
+        mm = 0
+        while True:
+            x = self.GRADUATION_START + mm * self.PX_PER_MM
+            # Hauteur de l'équerre à cette abscisse : les graduations restent à l'intérieur
+            room = self.HEIGHT * (1 - x / self.WIDTH) - 2
+            if room < 4:
+                break
+            length = min(16 if mm % 10 == 0 else 11 if mm % 5 == 0 else 7, room)
+            self.add_tick(x, self.HEIGHT, x, self.HEIGHT - length)
+            if mm % 10 == 0 and room > 36:
+                self.add_label(str(mm // 10), QPointF(x, self.HEIGHT - 28), 13)
+            mm += 1
+
+
+class VectorProtractor(VectorTool):
+    """
+    Rapporteur semi-circulaire gradué en degrés, avec une double numérotation (0 à gauche
+    à l'extérieur, 0 à droite à l'intérieur).
+    """
+
+    WIDTH, HEIGHT = 691, 361
+    RADIUS = 340
+    BASE = 14  # Hauteur de la bande sous la ligne de base
+    END_INSET = 3  # Décalage, en degrés, des textes de 0° et 180° : sinon ils chevauchent la ligne de base
+
+    def build(self):
+        cx, cy, radius = self.WIDTH / 2, self.HEIGHT - self.BASE, self.RADIUS
+        disc = QRectF(cx - radius, cy - radius, 2 * radius, 2 * radius)
+        self.body.moveTo(cx + radius, cy)
+        self.body.arcTo(disc, 0, 180)
+        self.body.lineTo(cx - radius, cy + self.BASE)
+        self.body.lineTo(cx + radius, cy + self.BASE)
+        self.body.closeSubpath()
+        self.lines.addPath(self.body)
+        self.add_tick(cx - radius, cy, cx + radius, cy)  # Ligne de base
+        self.add_tick(cx, cy, cx, cy - radius + 20)  # Repère de 90°
+        self.lines.addEllipse(QPointF(cx, cy), 6, 6)  # Centre
+
+        def point(degrees, distance):
+            angle = math.radians(degrees)
+            return QPointF(cx + distance * math.cos(angle), cy - distance * math.sin(angle))
+
+        for degrees in range(181):
+            length = 20 if degrees % 10 == 0 else 13 if degrees % 5 == 0 else 8
+            outer, inner = point(degrees, radius), point(degrees, radius - length)
+            self.add_tick(outer.x(), outer.y(), inner.x(), inner.y())
+            if degrees % 10 == 0:
+                # Textes tangents à l'arc, lisibles depuis le centre
+                place = min(max(degrees, self.END_INSET), 180 - self.END_INSET)
+                self.add_label(str(180 - degrees), point(place, radius - 34), 16, 90 - degrees)
+                self.add_label(str(degrees), point(place, radius - 54), 11, 90 - degrees)
+
+
+class ToolScene(QGraphicsView):
+    """
+    Rendu en mode retenu : chaque outil est un QGraphicsPixmapItem d'une scène.
+
+    La rotation, le zoom et la position sont des transformations d'item appliquées
+    par le QPainter au moment de l'affichage : aucune nouvelle QPixmap n'est calculée
+    par image, et chaque outil se déplace indépendamment des autres.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setFrameShape(QFrame.NoFrame)
+        self.setStyleSheet("background: transparent;")
+        self.viewport().setAutoFillBackground(False)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setRenderHint(QPainter.SmoothPixmapTransform)
+        # Les événements souris restent gérés par la fenêtre principale
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.tool_items = {}  # Nom de l'instance d'outil -> QGraphicsPixmapItem
+        self.pyramids = {}  # Nom de l'instance d'outil -> MipmapPyramid (partagée entre instances d'un même outil)
+        self.transformation_mode = Qt.SmoothTransformation
+        self.device_pixel_ratio = 1.0  # Pixels physiques par pixel logique de l'écran de la vue
+
+    def set_tools(self, tools):
+        '''
+        Remplace le contenu de la scène.
+
+        Args:
+            tools (dict): Nom de l'instance d'outil -> (MipmapPyramid, QPointF) : image traitée et position
+                dans la scène du coin supérieur gauche de l'outil à sa taille d'origine. Les outils sont
+                empilés dans l'ordre du dictionnaire.
+        '''
+        self.scene().clear()
+        self.tool_items = {}
+        self.pyramids = {}
+        for z, (name, (pyramid, pos)) in enumerate(tools.items()):
+            self.add_tool(name, pyramid, pos, z)
+
+    def add_tool(self, name, pyramid, pos, z=0):
+        '''
+        Ajoute une instance d'outil à la scène (voir set_tools), à la hauteur d'empilement `z`.
+        '''
+        item = QGraphicsPixmapItem(pyramid.levels[0])
+        item.setTransformationMode(self.transformation_mode)
+        item.setShapeMode(QGraphicsPixmapItem.BoundingRectShape)
+        item.setTransformOriginPoint(item.boundingRect().center())
+        item.setPos(pos + self.full_center(pyramid) - item.boundingRect().center())
+        item.setZValue(z)
+        item.setData(0, name)
+        self.scene().addItem(item)
+        self.tool_items[name] = item
+        self.pyramids[name] = pyramid
+        return item
+
+    def remove_tool(self, name):
+        item = self.tool_items.pop(name)
+        self.pyramids.pop(name)
+        self.scene().removeItem(item)
+
+    def set_z(self, name, z):
+        self.tool_items[name].setZValue(z)
+
+    def overlaps(self, rect):
+        '''
+        Indique si un outil chevauche `rect` (coordonnées de la scène), via l'index de la scène.
+        '''
+        return bool(self.scene().items(rect))
+
+    def set_tool_transform(self, key, angle, scale):
+        '''
+        Applique la rotation et le zoom d'un outil, autour de son centre.
+
+        L'item affiche le niveau de la pyramide le plus proche de la taille à l'écran, en
+        pixels physiques ; son facteur d'échelle ne compense que l'écart restant.
+        '''
+        item = self.tool_items[key]
+        pyramid = self.pyramids[key]
+        level = pyramid.level_for(scale * self.device_pixel_ratio)
+        if level.cacheKey() != item.pixmap().cacheKey():
+            # Changer de niveau sans déplacer le centre de l'outil
+            old_center = item.boundingRect().center()
+            item.setPixmap(level)
+            new_center = item.boundingRect().center()
+            item.setTransformOriginPoint(new_center)
+            item.setPos(item.pos() + old_center - new_center)
+        item.setRotation(angle)
+        item.setScale(scale * pyramid.width() / level.width())
+
+    def set_fast_preview(self, fast):
+        '''
+        Passe les outils en rendu rapide (plus proche voisin) pendant un geste, ou en rendu lissé.
+        '''
+        self.transformation_mode = Qt.FastTransformation if fast else Qt.SmoothTransformation
+        self.setRenderHint(QPainter.SmoothPixmapTransform, not fast)
+        for item in self.tool_items.values():
+            item.setTransformationMode(self.transformation_mode)
+
+    def anchor(self, key):
+        '''
+        Déplace l'outil pour que son rectangle englobant commence en (0, 0).
+        '''
+        item = self.tool_items[key]
+        item.setPos(item.pos() - item.sceneBoundingRect().topLeft())
+
+    def tool_at(self, pos):
+        '''
+        Retourne l'item de l'outil situé sous `pos` (coordonnées de la vue), ou None.
+
+        Les zones transparentes d'un outil (coins de son rectangle englobant...) laissent
+        passer le clic vers l'outil situé dessous.
+        '''
+        if not self.viewport().rect().contains(pos):
+            return None  # Partie d'un outil masquée par le bord de la vue
+        scene_pos = self.mapToScene(pos)
+        for item in self.items(pos):
+            pyramid = self.pyramids[item.data(0)]
+            # Coordonnées dans le niveau affiché, ramenées à la taille d'origine
+            local = item.mapFromScene(scene_pos) * (pyramid.width() / item.pixmap().width())
+            if pyramid.hit_mask.contains(local.x(), local.y()):
+                return item
+        return None
+
+    def key_of(self, item):
+        return item.data(0) if item is not None else None
+
+    def set_pyramid(self, key, pyramid):
+        '''
+        Remplace la pyramide d'un outil (nouvelle résolution de décodage) ; le niveau affiché
+        est changé au prochain set_tool_transform, sans déplacer le centre de l'outil.
+        '''
+        self.pyramids[key] = pyramid
+
+    def origin(self, key):
+        '''
+        Position du coin supérieur gauche de l'outil à sa taille d'origine (voir set_tools).
+        '''
+        item = self.tool_items[key]
+        return item.pos() + item.boundingRect().center() - self.full_center(self.pyramids[key])
+
+    @staticmethod
+    def full_center(pyramid):
+        return QPointF(pyramid.width() / 2, pyramid.height() / 2)
+
+    def fit(self, margin=0, slack=0):
+        '''
+        Ajuste la taille de la vue aux outils de la scène.
+
+        Args:
+            margin (int): Marge ajoutée à droite et en bas.
+            slack (int): Espace libre toléré avant de réduire la vue ; la moitié est ajoutée
+                à la nouvelle taille pour que les petits déplacements suivants ne la changent pas.
+
+        Returns:
+            bool: True si la taille de la vue a changé.
+        '''
+        rect = self.scene().itemsBoundingRect()
+        needed = QSize(max(1, math.ceil(rect.right())) + margin, max(1, math.ceil(rect.bottom())) + margin)
+        free = self.size() - needed
+        if 0 <= free.width() <= slack and 0 <= free.height() <= slack:
+            return False
+        size = needed + QSize(slack // 2, slack // 2)
+        self.setSceneRect(0, 0, size.width(), size.height())
+        self.setFixedSize(size)
+        return True
+
+
+class RenderScheduler(QObject):
+    """
+    Regroupe les demandes de rotation, de zoom et de déplacement et déclenche au plus
+    un rendu par image (limité à `max_fps` rendus par seconde).
+
+    Les deltas reçus entre deux rendus sont cumulés par cible : une souris à haute
+    fréquence ou une touche maintenue ne produisent plus un rendu par événement.
+    """
+
+    def __init__(self, render, max_fps=60, parent=None):
+        '''
+        Args:
+            render (callable): Fonction `render(target, angle, factor, pos)` appelée une fois par cible et par image.
+            max_fps (int | None): Nombre maximal de rendus par seconde (None ou 0 = illimité).
+            parent (QObject): Parent Qt.
+        '''
+        super().__init__(parent)
+        self.render = render
+        self.max_fps = max_fps
+        self.pending = {}  # Cible -> [angle cumulé, facteur de zoom cumulé, dernière position]
+        self._last_frame = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def frame_interval(self):
+        '''
+        Durée minimale entre deux rendus, en secondes.
+        '''
+        return 1.0 / self.max_fps if self.max_fps else 0.0
+
+    def rotate(self, target, angle):
+        self._pending(target)[0] += angle
+        self._schedule()
+
+    def scale(self, target, factor):
+        self._pending(target)[1] *= factor
+        self._schedule()
+
+    def move(self, target, pos):
+        self._pending(target)[2] = pos
+        self._schedule()
+
+    def cancel(self):
+        '''
+        Abandonne les transformations en attente.
+        '''
+        self._timer.stop()
+        self.pending = {}
+
+    def flush(self):
+        '''
+        Applique immédiatement toutes les transformations en attente.
+        '''
+        self._timer.stop()
+        pending, self.pending = self.pending, {}
+        self._last_frame = time.perf_counter()
+        for target, (angle, factor, pos) in pending.items():
+            self.render(target, angle, factor, pos)
+
+    def _pending(self, target):
+        return self.pending.setdefault(target, [0.0, 1.0, None])
+
+    def _schedule(self):
+        if self._timer.isActive():
+            return
+        # Premier événement après une pause : rendu dès le retour à la boucle d'événements
+        elapsed = time.perf_counter() - self._last_frame
+        delay = max(0.0, self.frame_interval - elapsed)
+        self._timer.start(math.ceil(delay * 1000))
+
+
+class BackgroundPool(QObject):
+    """
+    Exécute les traitements coûteux (décodage, rendu lissé) dans des threads et remet
+    leurs résultats au thread de l'interface, qui ne reste jamais bloqué.
+
+    Chaque tâche appartient à un canal (un outil à charger, une cible à afficher...) :
+    une nouvelle tâche sur le même canal rend la précédente caduque. Celle-ci est annulée
+    si elle n'a pas encore commencé, et son résultat est ignoré sinon. Les fonctions
+    exécutées ne doivent manipuler que des QImage : les QPixmap restent dans le thread
+    de l'interface.
+    """
+
+    finished = pyqtSignal(object, int, object)  # Canal, génération, Future terminée
+
+    def __init__(self, max_workers, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geomathiques")
+        self.generation = 0
+        self.tasks = {}  # Canal -> (génération, Future, fonction appelée avec le résultat)
+        # Émis depuis un thread de traitement : connexion en file, reçue dans le thread de l'interface
+        self.finished.connect(self._deliver)
+
+    def submit(self, channel, function, callback):
+        '''
+        Lance `function()` en arrière-plan ; `callback(résultat)` sera appelée dans le thread
+        de l'interface, sauf si une tâche plus récente a été soumise sur le même canal.
+        '''
+        self.cancel(channel)
+        self.generation += 1
+        generation = self.generation
+        future = self.executor.submit(function)
+        self.tasks[channel] = (generation, future, callback)
+        future.add_done_callback(lambda done: self.finished.emit(channel, generation, done))
+
+    def pending(self, channel):
+        return channel in self.tasks
+
+    def cancel(self, channel):
+        '''
+        Rend caduque la tâche d'un canal.
+        '''
+        task = self.tasks.pop(channel, None)
+        if task:
+            task[1].cancel()
+
+    def cancel_all(self, predicate=None):
+        '''
+        Rend caduques les tâches des canaux pour lesquels `predicate(canal)` est vrai (toutes par défaut).
+        '''
+        for channel in [channel for channel in self.tasks if predicate is None or predicate(channel)]:
+            self.cancel(channel)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False)
+
+    def _deliver(self, channel, generation, future):
+        task = self.tasks.get(channel)
+        if task is None or task[0] != generation or future.cancelled():
+            return  # Tâche dépassée par une demande plus récente
+        del self.tasks[channel]
+        error = future.exception()
+        if error is not None:
+            print(f"Erreur du traitement en arrière-plan {channel} : {error!r}", file=sys.stderr)
+            return
+        task[2](future.result())
+
+
+class FrameLabel(QLabel):
+    """
+    Label d'un outil (moteur "label") : il affiche une image rendue (QPixmap), ou
+    directement sa surface de rendu réutilisée pour les aperçus pendant un geste, sans
+    la recopier dans une QPixmap. La surface est libérée quand une image rendue la
+    remplace hors d'un geste.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.render_target = RenderTarget()
+        self.showing_target = False
+
+    def show_frame(self, frame, release=False):
+        '''
+        Affiche une image rendue, ou la surface de rendu du label, et ajuste la taille du label.
+
+        Args:
+            frame (QPixmap | RenderTarget): Image à afficher.
+            release (bool): Libérer la surface de rendu si une image rendue la remplace.
+        '''
+        self.showing_target = frame is self.render_target
+        if self.showing_target:
+            self.clear()
+            self.updateGeometry()
+        else:
+            self.setPixmap(frame)
+            if release:
+                self.render_target.release()
+        self.resize(logical_size(frame))
+        self.update()
+
+    def sizeHint(self):
+        if self.showing_target:
+            return logical_size(self.render_target)
+        return super().sizeHint()
+
+    def paintEvent(self, event):
+        if not self.showing_target:
+            super().paintEvent(event)
+            return
+        # Même position qu'une QPixmap dans un QLabel : selon l'alignement du label
+        target = self.render_target
+        rect = QStyle.alignedRect(self.layoutDirection(), self.alignment(), logical_size(target), self.contentsRect())
+        painter = QPainter(self)
+        painter.drawImage(QRectF(rect), target.image, QRectF(target.rect))
+        painter.end()
+
+
+class StrokeCanvas(QWidget):
+    """
+    Calque de dessin du mode dessin (D), au-dessus des outils.
+
+    Les traits sont gardés sous forme de tableaux compacts de coordonnées (`array('f')`,
+    x et y alternés) et peints au fur et à mesure dans une QImage : chaque événement
+    souris ne dessine que le nouveau segment. L'annulation repart du dernier point de
+    reprise (une copie de l'image tous les CHECKPOINT_INTERVAL traits) et rejoue les
+    traits suivants. Au-delà de MAX_UNDO traits, les plus anciens sont définitivement
+    intégrés à l'image de base : la mémoire reste bornée quelle que soit la durée de la séance.
+    """
+    PEN_COLOR = QColor(220, 0, 0)
+    PEN_WIDTH = 3
+    MAX_UNDO = 100  # Nombre de traits annulables
+    CHECKPOINT_INTERVAL = 20  # Traits entre deux points de reprise
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.pen = QPen(self.PEN_COLOR, self.PEN_WIDTH, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self.strokes = []  # Traits annulables : array('f') [x0, y0, x1, y1, ...]
+        self.current = None  # Trait en cours de tracé
+        self.checkpoints = {0: QImage()}  # Nombre de traits déjà peints -> copie de l'image
+        self.image = QImage()
+        self.device_pixel_ratio = 1.0  # L'image de dessin est en pixels physiques
+        self._painted_region = None  # Zone couverte par les traits, calculée au besoin
+
+    def begin_stroke(self, pos):
+        stroke = array("f", (pos.x(), pos.y()))
+        self.strokes.append(stroke)
+        self.current = stroke
+        self.ensure_size(self.size())
+        self.update(self.paint_segment(stroke, 0))
+
+    def extend_stroke(self, pos):
+        '''
+        Ajoute un point au trait en cours et ne peint que le segment ajouté.
+        '''
+        stroke = self.current
+        if stroke is None:
+            return
+        stroke.extend((pos.x(), pos.y()))
+        self.update(self.paint_segment(stroke, len(stroke) // 2 - 1))
+
+    def end_stroke(self):
+        '''
+        Termine le trait en cours : point de reprise éventuel et limite de l'historique.
+        '''
+        if self.current is None:
+            return
+        self.current = None
+        self._painted_region = None
+        if len(self.strokes) % self.CHECKPOINT_INTERVAL == 0:
+            self.checkpoints[len(self.strokes)] = self.image.copy()
+        if len(self.strokes) > self.MAX_UNDO:
+            # Les traits les plus anciens ne sont plus annulables : l'image après ces traits
+            # devient l'image de base et leurs coordonnées sont libérées
+            base = self.snapshot(self.CHECKPOINT_INTERVAL)
+            del self.strokes[:self.CHECKPOINT_INTERVAL]
+            self.checkpoints = {
+                count - self.CHECKPOINT_INTERVAL: image
+                for count, image in self.checkpoints.items() if count > self.CHECKPOINT_INTERVAL
+            }
+            self.checkpoints[0] = base
+
+    def snapshot(self, count):
+        '''
+        Image de dessin après les `count` premiers traits : le point de reprise correspondant,
+        ou le précédent complété des traits suivants.
+        '''
+        if count in self.checkpoints:
+            return self.checkpoints[count]
+        current = self.image
+        self.replay(count)
+        image, self.image = self.image, current
+        return image
+
+    def replay(self, count):
+        '''
+        Repeint l'image de dessin avec les `count` premiers traits, depuis le point de reprise précédent.
+        '''
+        start = max(n for n in self.checkpoints if n <= count)
+        self.restore(self.checkpoints[start])
+        for stroke in self.strokes[start:count]:
+            for index in range(len(stroke) // 2):
+                self.paint_segment(stroke, index)
+
+    def undo(self):
+        '''
+        Supprime le dernier trait et repart du point de reprise précédent.
+
+        Returns:
+            bool: False s'il n'y avait aucun trait à annuler.
+        '''
+        if not self.strokes:
+            return False
+        self.current = None
+        self._painted_region = None
+        self.strokes.pop()
+        count = len(self.strokes)
+        self.checkpoints = {n: image for n, image in self.checkpoints.items() if n <= count}
+        self.replay(count)
+        self.update()
+        return True
+
+    def clear(self):
+        '''
+        Efface tous les traits et l'historique.
+        '''
+        self.strokes = []
+        self.current = None
+        self._painted_region = None
+        self.checkpoints = {0: QImage()}
+        self.restore(QImage())
+        self.update()
+
+    def painted_region(self):
+        '''
+        Zone couverte par les traits, en pixels logiques : calculée depuis l'alpha de l'image
+        de dessin, puis gardée jusqu'au prochain changement des traits.
+        '''
+        if self._painted_region is None:
+            if not self.strokes and self.checkpoints[0].isNull():
+                self._painted_region = QRegion()
+            else:
+                self._painted_region = mask_region(alpha_mask(self.image, 0), self.image.devicePixelRatio())
+        return self._painted_region
+
+    def memory_bytes(self):
+        points = sum(stroke.itemsize * len(stroke) for stroke in self.strokes)
+        images = sum(image.sizeInBytes() for image in self.checkpoints.values())
+        return points + images + self.image.sizeInBytes()
+
+    def ensure_size(self, size):
+        '''
+        Agrandit l'image de dessin si le calque dépasse sa taille (elle n'est jamais réduite,
+        pour que les traits restent intacts si la fenêtre grandit de nouveau).
+        '''
+        current = logical_size(self.image)
+        if current.width() >= size.width() and current.height() >= size.height():
+            return
+        self.restore(self.image, size.expandedTo(current))
+
+    def set_device_pixel_ratio(self, ratio):
+        '''
+        Change la résolution de l'image de dessin (la fenêtre a changé d'écran).
+        '''
+        if ratio != self.device_pixel_ratio:
+            self.device_pixel_ratio = ratio
+            self._painted_region = None
+            self.restore(self.image)
+            self.update()
+
+    def restore(self, source, size=None):
+        '''
+        Remplace l'image de dessin par une copie de `source`, à la taille courante au moins.
+        '''
+        size = (size or logical_size(self.image)).expandedTo(self.size())
+        image = QImage(size * self.device_pixel_ratio, QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(self.device_pixel_ratio)
+        image.fill(Qt.transparent)
+        if not source.isNull():
+            painter = QPainter(image)
+            painter.drawImage(0, 0, source)
+            painter.end()
+        self.image = image
+
+    def paint_segment(self, stroke, index):
+        '''
+        Peint le segment d'un trait qui aboutit au point `index` (le premier point seul pour 0).
+
+        Returns:
+            QRect: Zone modifiée de l'image.
+        '''
+        end = QPointF(stroke[2 * index], stroke[2 * index + 1])
+        start = QPointF(stroke[2 * index - 2], stroke[2 * index - 1]) if index else end
+        painter = QPainter(self.image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen)
+        if start == end:
+            painter.drawPoint(start)
+        else:
+            painter.drawLine(start, end)
+        painter.end()
+        margin = self.PEN_WIDTH
+        return QRectF(start, end).normalized().adjusted(-margin, -margin, margin, margin).toAlignedRect()
+
+    def resizeEvent(self, event):
+        self.ensure_size(event.size())
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        # Seule la zone à repeindre est recopiée (zone source en pixels physiques)
+        ratio = self.image.devicePixelRatio()
+        painter = QPainter(self)
+        painter.drawImage(QRectF(event.rect()), self.image, QTransform.fromScale(ratio, ratio).mapRect(QRectF(event.rect())))
+        painter.end()
+
 
 class TransparentWindow(QMainWindow):
     BUTTON_SIZE = (120, 30)
     BUTTON_SPACING = 40
     TRANSPARENCY_ALPHA = 2
-
-    def __init__(self, rapporteur_path, equerre_path, regle_path):
+    WHITE_TOLERANCE = 0  # Écart à 255 toléré pour considérer un pixel comme blanc
+    CONTRAST_FACTOR = 2.0
+    BRIGHTNESS_FACTOR = 1.2
+    MAX_FPS = 60  # Nombre maximal de rendus par seconde pendant les manipulations (None = illimité)
+    REFINE_DELAY_MS = 150  # Inactivité après laquelle l'aperçu rapide est remplacé par un rendu lissé
+    FRAME_CACHE_BYTES = 64 * 1024 * 1024  # Budget mémoire du cache des images rendues
+    PRERENDER_DELAY_MS = 300  # Inactivité avant de pré-calculer les angles voisins
+    PRERENDER_ANGLES = (1, -1, 90, -90)  # Écarts d'angle pré-calculés autour de l'angle affiché
+    SHRINK_SLACK = 100  # Espace libre toléré autour des outils avant de réduire la fenêtre
+    MEMORY_BUDGET = 128 * 1024 * 1024  # Budget mémoire global des images gardées (outils, pyramides, rendus)
+    SCREEN_FILL = 0.9  # Part maximale de l'écran occupée par un outil à l'ouverture
+    MAX_DECODE_REDUCTION = 8  # Réduction maximale (puissance de 2) appliquée au décodage des PNG
+    BACKGROUND_WORKERS = 2  # Threads de traitement en arrière-plan (0 = tout dans le thread de l'interface)
+    MAX_INPUT_REGIONS = 256  # Régions de saisie gardées en mémoire pour le mode clic à travers
+
+    RENDER_BACKENDS = ("label", "scene")
+    TOOL_MODES = ("Rapporteur", "Équerre", "Règle", "Équerre + Règle")
+    SKINS = ("png", "vector")  # Apparence des outils : PNG traités ou tracés vectoriels
+    VECTOR_TOOLS = {"rapporteur": VectorProtractor, "equerre": VectorSetSquare, "regle": VectorRuler}
+
+    def __init__(self, rapporteur_path, equerre_path, regle_path, cache_dir=None, backend="label", timing_log=None,
+                 asset_pack=None, memory_budget=None, workers=None, skin="png", input_trace=None):
         super().__init__()
+        if backend not in self.RENDER_BACKENDS:
+            raise ValueError(f"Moteur de rendu inconnu : {backend}")
+        if skin not in self.SKINS:
+            raise ValueError(f"Apparence inconnue : {skin}")
+        # Mesure des étapes du rendu : active si un journal est demandé ou si l'affichage des mesures est ouvert (F3)
+        self.timing_log = timing_log
+        self.instrumentation = Instrumentation(enabled=timing_log is not None)
+        self.backend = backend  # "label" : QPixmap recalculées, "scene" : transformations d'items QGraphicsView
+        # Outils traités : paquet précompilé, puis mémoire et éventuellement disque
+        self.asset_pack = AssetPack(asset_pack) if asset_pack else None
+        self.asset_cache = AssetCache(cache_dir, self.asset_pack)
+        # Outils vectoriels : peints directement à chaque angle et zoom, sans PNG
+        self.vector_tools = {key: tool() for key, tool in self.VECTOR_TOOLS.items()} if skin == "vector" else {}
+        self.pyramids = {}  # Pyramides de niveaux réduits des outils, pour le zoom
+        self.memory_budget = memory_budget or self.MEMORY_BUDGET
+        self.source_sizes = {}  # Taille d'origine des PNG, lue dans leur en-tête
+        self.decode_reductions = {}  # Outil -> réduction de la version décodée gardée en mémoire
+        self.device_pixel_ratio = self.devicePixelRatioF()  # Les images sont rendues en pixels physiques
+        self.screen_tracked = False  # Changements d'écran suivis (après le premier affichage)
+        # Décodage et rendus lissés en arrière-plan ; l'image actuelle reste affichée en attendant
+        workers = self.BACKGROUND_WORKERS if workers is None else workers
+        self.pool = BackgroundPool(workers, self) if workers else None
+        self.tool_waiters = {}  # (outil, paramètres) en cours de chargement -> fonctions à appeler ensuite
+        self.pending_tool_keys = ()  # Outils du mode demandé, affiché dès qu'ils sont tous chargés
+        self.mode_generation = 0  # Incrémenté à chaque changement de mode : les suites en attente sont abandonnées
         self.paths = {"rapporteur": rapporteur_path, "equerre": equerre_path, "regle": regle_path}
         self.current_image_key = "rapporteur"
-        self.rotation_angle = {"rapporteur": 0, "equerre": 0, "regle": 0}
-        self.scale_factor = {"rapporteur": 1, "equerre": 1, "regle": 1}
+        # Position, angle et zoom de chaque outil (positions de départ du mode "Équerre + Règle")
+        self.tool_states = {
+            "rapporteur": ToolState("rapporteur"),
+            "equerre": ToolState("equerre", QPoint(50, 50)),
+            "regle": ToolState("regle", QPoint(300, 150)),
+        }
+        self.fit_tools_to_screen()
+        # Instances affichées dans le mode "Équerre + Règle" -> ordre d'empilement (la plus haute au-dessus) ;
+        # chaque instance a son propre état, les images sont partagées entre instances d'un même outil
+        self.tool_z = {"equerre": 0, "regle": 1}
+        self.next_z = 2
+        self.instance_count = 0  # Numérotation des instances ajoutées ("regle-1", "equerre-2"...)
+        self.tool_index = SpatialGrid()  # Rectangles des labels d'outils affichés (moteur "label")
         self.dragged_label = None  # Label actuellement déplacé
+        self.active_label = None  # Outil sélectionné dans le mode "Équerre + Règle"
+        self.drawing = False  # Mode dessin (D) : la souris trace sur le calque de dessin
+        self.tools_extent = None  # Dernière taille de fenêtre calculée pour les outils du mode "Équerre + Règle"
         self.offset = None  # Décalage pour le déplacement
         self.is_rotating_label = None  # Label actuellement en rotation
         self.is_rotating = False  # Rotation de l'image principale
         self.last_mouse_pos = None  # Dernière position de la souris pour la rotation
+        self.scheduler = RenderScheduler(self.apply_pending_render, self.MAX_FPS, self)
+        self.interacting = False  # Geste en cours : rendu rapide, lissage différé
+        self.preview_targets = {}  # Cibles affichées en aperçu rapide -> rendu lissé à refaire
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(self.REFINE_DELAY_MS)
+        self.refine_timer.timeout.connect(self.end_interaction)
+        self.frame_cache = FrameCache(self.FRAME_CACHE_BYTES)  # Images rendues (outil, angle, zoom)
+        self.prerender_queue = []  # Images à pré-calculer pendant l'inactivité
+        self.prerender_timer = QTimer(self)
+        self.prerender_timer.setSingleShot(True)
+        self.prerender_timer.timeout.connect(self.prerender_step)
+        # Mode clic à travers (Espace) : seuls les pixels visibles des outils reçoivent la souris
+        self.click_through = False
+        self.input_regions = OrderedDict()  # Clé d'image rendue -> (QRegion, taille logique de l'image)
+        self.mask_timer = QTimer(self)  # Regroupe les mises à jour du masque en une par passage de la boucle
+        self.mask_timer.setSingleShot(True)
+        self.mask_timer.timeout.connect(self.apply_input_mask)
         self.init_ui()
         self.load_and_display_image()
+        # Enregistrement des événements reçus, écrit à la fermeture (--record-trace)
+        self.input_trace_path = input_trace
+        self.input_trace = None
+        if input_trace:
+            self.input_trace = InputTrace(self.trace_header(), self)
+            self.installEventFilter(self.input_trace)
 
     def init_ui(self):
 
@@ -39,13 +1985,24 @@ class TransparentWindow(QMainWindow):
         self.main_layout.addLayout(self.image_layout)
 
         # Labels pour chaque outil
-        self.image_label = QLabel(self)  # Pour les images individuelles (rapporteur, équerre, règle)
-        self.equerre_label = QLabel(self)  # Pour l'équerre (si utilisée avec règle)
-        self.regle_label = QLabel(self)  # Pour la règle (si utilisée avec équerre)
+        self.image_label = FrameLabel(self)  # Pour les images individuelles (rapporteur, équerre, règle)
+        self.equerre_label = FrameLabel(self)  # Pour l'équerre (si utilisée avec règle)
+        self.regle_label = FrameLabel(self)  # Pour la règle (si utilisée avec équerre)
+        # Labels des instances d'outils du mode "Équerre + Règle" (les instances ajoutées ont le leur)
+        self.tool_labels = {"equerre": self.equerre_label, "regle": self.regle_label}
+        self.label_names = {self.equerre_label: "equerre", self.regle_label: "regle"}
 
         # Ajouter le label principal
         self.image_layout.addWidget(self.image_label)
 
+        # Moteur "scene" : une seule vue affiche tous les outils, le label principal n'est pas utilisé
+        self.scene_view = None
+        if self.backend == "scene":
+            self.scene_view = ToolScene(self)
+            self.scene_view.device_pixel_ratio = self.device_pixel_ratio
+            self.image_layout.addWidget(self.scene_view, alignment=Qt.AlignLeft | Qt.AlignTop)
+            self.image_label.hide()
+
         # Zone pour les boutons
         self.button_layout = QVBoxLayout()
         self.main_layout.addLayout(self.button_layout)
@@ -55,6 +2012,18 @@ class TransparentWindow(QMainWindow):
         for button in self.buttons:
             self.button_layout.addWidget(button)
 
+        # Calque de dessin, au-dessus des outils et couvrant toute la fenêtre
+        self.canvas = StrokeCanvas(self)
+        self.canvas.device_pixel_ratio = self.device_pixel_ratio
+        self.canvas.resize(self.size())
+
+        # Affichage des mesures de rendu (F3)
+        self.stats_overlay = QLabel(self)
+        self.stats_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 170); color: white; font-family: monospace; font-size: 12px; padding: 4px;")
+        self.stats_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.stats_overlay.hide()
+        self.instrumentation.on_frame = self.update_stats_overlay
+
         # Ajuster les espaces
         self.main_layout.setContentsMargins(10, 10, 10, 10)
         self.main_layout.setSpacing(20)
@@ -80,7 +2049,7 @@ class TransparentWindow(QMainWindow):
             buttons.append(button)
 
         self.combo_box = QComboBox(self)
-        self.combo_box.addItems(["Rapporteur", "Équerre", "Règle", "Équerre + Règle"])
+        self.combo_box.addItems(self.TOOL_MODES)
         self.combo_box.setStyleSheet("background-color: white; border: 1px solid black; border-radius: 15px; font-size: 16px; padding: 5px;")
         self.combo_box.setFixedWidth(120)
         self.combo_box.setFocusPolicy(Qt.NoFocus)
@@ -91,68 +2060,289 @@ class TransparentWindow(QMainWindow):
 
 
 
-    def load_and_display_image(self):
+    @timed_frame("load_and_display_image")
+    def load_and_display_image(self):
+        '''
+        Charge l'image actuelle, applique des transformations, et ajuste la taille de la fenêtre.
+        '''
+        if not self.tool_loaded(self.current_image_key):
+            # Premier chargement en arrière-plan : l'affichage actuel est conservé
+            self.load_tool_in_background(self.current_image_key, self.load_and_display_image)
+            return
+        if self.scene_view:
+            self.scene_view.set_tools({self.current_image_key: (self.get_tool_pyramid(self.current_image_key), QPointF(0, 0))})
+        self.update_displayed_image()
+
+    def get_tool_pixmap(self, key):
+        '''
+        Retourne la QPixmap traitée d'un outil, depuis le cache si elle y est déjà.
+
+        Args:
+            key (str): Nom de l'outil ("rapporteur", "equerre" ou "regle").
+
+        Returns:
+            QPixmap: Image traitée et prête à être affichée.
+        '''
+        if key in self.vector_tools:
+            return self.vector_tools[key].pixmap()
+        params = self.tool_params(key)
+        reduction = self.decode_reductions[key]
+        pixmap = self.asset_cache.get(
+            key, self.paths[key], params, functools.partial(self.build_tool_image, reduction=reduction)
+        )
+        self.enforce_memory_budget()
+        return pixmap
+
+    def tool_loaded(self, key):
+        '''
+        Indique si l'image traitée d'un outil est disponible sans décoder le PNG.
+
+        Sans traitement en arrière-plan, l'outil est toujours considéré comme disponible :
+        il sera construit à la demande.
+        '''
+        if self.pool is None or key in self.vector_tools:
+            return True
+        return self.asset_cache.lookup(key, self.paths[key], self.tool_params(key)) is not None
+
+    def load_tool_in_background(self, key, then):
+        '''
+        Décode et traite un outil dans le pool, puis appelle `then()` dans le thread de
+        l'interface, sauf si le mode a changé entre-temps.
+        '''
+        params = self.tool_params(key)
+        job = (key, params)
+        generation = self.mode_generation
+        waiters = self.tool_waiters.setdefault(job, [])
+        waiters.append(lambda: generation == self.mode_generation and then())
+        if len(waiters) > 1:
+            return  # Déjà en cours de chargement
+
+        def loaded(image):
+            self.asset_cache.store(key, self.paths[key], params, image)
+            # Les suites passent avant le budget : le mode demandé devient visible, son outil est gardé
+            for waiter in self.tool_waiters.pop(job, []):
+                waiter()
+            self.enforce_memory_budget()
+
+        build = functools.partial(self.build_tool_image, self.paths[key], reduction=self.decode_reductions[key])
+        self.pool.submit(("tool", job), build, loaded)
+
+    def get_tool_pyramid(self, key):
+        '''
+        Retourne la pyramide de niveaux réduits d'un outil, construite une seule fois.
+
+        Args:
+            key (str): Nom de l'outil.
+
+        Returns:
+            MipmapPyramid: Pyramide construite à partir de l'image traitée.
+        '''
+        pyramid_key = (key, self.tool_params(key))
+        pyramid = self.pyramids.get(pyramid_key)
+        if pyramid is None:
+            pyramid = MipmapPyramid(self.get_tool_pixmap(key), self.source_size(key), self.TRANSPARENCY_ALPHA)
+            self.pyramids[pyramid_key] = pyramid
+        return pyramid
+
+    def tool_params(self, key):
+        '''
+        Paramètres de la version d'un outil à utiliser : traitement et réduction au décodage.
+
+        Une version plus fine déjà en mémoire est conservée quand on dézoome ; le PNG n'est
+        décodé de nouveau, à plus haute résolution, que si le zoom dépasse ce qu'elle permet.
+        '''
+        if key in self.vector_tools:
+            return ("vector",)
+        needed = self.decode_reduction(key)
+        held = self.decode_reductions.get(key)
+        if held is None or held > needed:
+            if held is not None:
+                # Version trop grossière pour le zoom demandé : elle est remplacée
+                self.discard_tool_images(key)
+            self.decode_reductions[key] = needed
+        reduction = self.decode_reductions[key]
+        params = self.processing_params()
+        return params + (("reduction", reduction),) if reduction > 1 else params
+
+    def decode_reduction(self, key):
+        '''
+        Plus grande réduction (1, 2, 4...) au décodage qui garde assez de pixels physiques pour le zoom de l'outil.
+
+        Toutes les instances affichées d'un outil partagent la même version décodée : la plus
+        zoomée d'entre elles fixe la réduction.
+        '''
+        scales = [self.tool_states[name].scale for name in self.visible_tools() if self.tool_states[name].key == key]
+        scale = max(scales, default=self.tool_states[key].scale) * self.device_pixel_ratio
+        reduction = 1
+        while reduction * 2 <= self.MAX_DECODE_REDUCTION and scale * reduction * 2 <= 1:
+            reduction *= 2
+        return reduction
+
+    def source_size(self, key):
+        '''
+        Taille d'origine du PNG d'un outil, lue dans son en-tête sans le décoder.
+        '''
+        if key in self.vector_tools:
+            return self.vector_tools[key].size()
+        size = self.source_sizes.get(key)
+        if size is None:
+            size = QImageReader(self.paths[key]).size()
+            if not size.isValid() and self.asset_pack:
+                # PNG absent (paquet seul) : l'en-tête du paquet donne la taille en pleine résolution
+                size = self.asset_pack.size(key)
+            self.source_sizes[key] = size
+        return size
+
+    def fit_tools_to_screen(self):
+        '''
+        Réduit le zoom de départ des outils plus grands que l'écran : ils sont alors décodés
+        directement à une résolution adaptée.
+        '''
+        screen = QApplication.primaryScreen()
+        if screen is None:
+            return
+        available = screen.availableGeometry().size()
+        for key, state in self.tool_states.items():
+            size = self.source_size(key)
+            if size.isEmpty():
+                continue
+            state.scale = min(1.0, self.SCREEN_FILL * available.width() / size.width(),
+                              self.SCREEN_FILL * available.height() / size.height())
+
+    def visible_tools(self):
+        '''
+        Noms des instances d'outils affichées.
+        '''
+        if self.current_image_key == "equerre + regle":
+            return set(self.tool_z)
+        return {self.current_image_key}
+
+    def discard_tool_images(self, key):
+        '''
+        Oublie toutes les images gardées en mémoire pour un outil (version traitée, pyramide, rendus).
+        '''
+        self.asset_cache.discard(key)
+        self.pyramids = {pyramid_key: pyramid for pyramid_key, pyramid in self.pyramids.items() if pyramid_key[0] != key}
+        self.frame_cache.discard(key)
+        self.decode_reductions.pop(key, None)
+
+    def enforce_memory_budget(self):
+        '''
+        Ramène la mémoire des images gardées sous le budget global : les images rendues les
+        moins récemment utilisées partent d'abord, puis les outils qui ne sont pas affichés.
+        Les outils en cours de chargement et ceux du mode demandé sont gardés : les évincer
+        relancerait leur décodage sans fin.
+        '''
+        excess = self.cache_memory_bytes() - self.memory_budget
+        if excess <= 0:
+            return
+        self.frame_cache.trim(self.frame_cache.bytes - excess)
+        if self.cache_memory_bytes() <= self.memory_budget:
+            return
+        kept = {self.tool_states[name].key for name in self.visible_tools()}
+        kept.update(key for key, _params in self.tool_waiters)
+        kept.update(self.pending_tool_keys)
+        for key in self.paths:
+            if key not in kept:
+                self.discard_tool_images(key)
+
+    def processing_params(self):
+        '''
+        Paramètres du traitement des outils : toute modification invalide le cache.
+        '''
+        return (self.TRANSPARENCY_ALPHA, self.WHITE_TOLERANCE, self.CONTRAST_FACTOR, self.BRIGHTNESS_FACTOR)
+
+    def build_tool_image(self, path, reduction=1):
         '''
-        Charge l'image actuelle, applique des transformations, et ajuste la taille de la fenêtre.
+        Décode le PNG d'un outil et applique le traitement complet.
+
+        Args:
+            path (str): Chemin du PNG source.
+            reduction (int): Facteur de réduction appliqué dès le décodage (1 = pleine résolution).
+
+        Returns:
+            QImage: Image traitée.
         '''
+        from PIL import Image
+
+        with self.instrumentation.stage("decode"):
+            pil_image = Image.open(path).convert("RGBA")
+            if reduction > 1:
+                # Le traitement ne porte plus que sur les pixels utiles
+                pil_image = pil_image.reduce(reduction)
+        return self.process_image(pil_image)
 
-        pil_image = Image.open(self.paths[self.current_image_key]).convert("RGBA")
-        self.current_pixmap = self.process_image(pil_image)
-        self.image_label.setPixmap(self.current_pixmap)
-        self.image_label.resize(self.current_pixmap.size())
 
+    def build_asset_pack(self, path):
+        '''
+        Construit le paquet précompilé de tous les outils, à partir des PNG.
+
+        Args:
+            path (str): Chemin du paquet à écrire.
+        '''
+        tools = {key: (source_path, self.build_tool_image(source_path)) for key, source_path in self.paths.items()}
+        AssetPack.build(path, tools, self.processing_params())
 
     def process_image(self, pil_image):
         '''
-        Transforme l'image Pillow en QPixmap, en appliquant des ajustements de contraste,
+        Transforme l'image Pillow en QImage, en appliquant des ajustements de contraste,
         de luminosité, et de transparence.
 
         Args:
             pil_image (PIL.Image.Image): Image chargée avec Pillow.
 
         Returns:
-            QPixmap: Image transformée et prête à être affichée.
+            QImage: Image transformée et prête à être affichée.
         '''
         # Rendre les pixels blancs semi-transparents
-        data = [
-            (r, g, b, self.TRANSPARENCY_ALPHA if (r, g, b) == (255, 255, 255) else a)
-            for r, g, b, a in pil_image.getdata()
-        ]
-        pil_image.putdata(data)
+        with self.instrumentation.stage("transparency"):
+            make_white_transparent(pil_image, self.TRANSPARENCY_ALPHA, self.WHITE_TOLERANCE)
 
         # Ajuster le contraste et la luminosité
-        pil_image = ImageEnhance.Contrast(pil_image).enhance(2.0)
-        pil_image = ImageEnhance.Brightness(pil_image).enhance(1.2)
+        with self.instrumentation.stage("enhance"):
+            pil_image = enhance_contrast_brightness(pil_image, self.CONTRAST_FACTOR, self.BRIGHTNESS_FACTOR)
 
-        return QPixmap.fromImage(QImage(pil_image.tobytes("raw", "RGBA"), *pil_image.size, QImage.Format_RGBA8888))
+        with self.instrumentation.stage("to_qimage"):
+            return pil_to_qimage(pil_image)
 
+    @timed_stage("layout")
     def adjust_window_size(self):
         """
-        Ajuste dynamiquement la taille de la fenêtre pour que l'équerre et la règle
-        soient entièrement visibles.
+        Ajuste dynamiquement la taille de la fenêtre pour que tous les outils du mode
+        "Équerre + Règle" soient entièrement visibles.
         """
-        # Calculer les limites des outils (équerre et règle)
-        equerre_rect = self.equerre_label.geometry()
-        regle_rect = self.regle_label.geometry()
-
-        # Trouver les limites maximales
-        max_width = max(equerre_rect.right(), regle_rect.right()) + 20  # +20 pour un peu de marge
-        max_height = max(equerre_rect.bottom(), regle_rect.bottom()) + 20  # +20 pour un peu de marge
+        if self.scene_view:
+            if self.scene_view.fit(margin=20, slack=self.SHRINK_SLACK):
+                self.fit_window_to_scene()
+            return
 
-        # Ajuster la taille de la fenêtre
-        self.setMinimumSize(max_width, max_height)
-        self.resize(max(self.width(), max_width), max(self.height(), max_height))
+        # Limites de l'ensemble des outils, tenues à jour par l'index spatial
+        bounds = self.tool_index.bounds()
+        max_width = max(bounds.right(), 0) + 20  # +20 pour un peu de marge
+        max_height = max(bounds.bottom(), 0) + 20  # +20 pour un peu de marge
+
+        # La fenêtre n'est redimensionnée que si un outil franchit son bord, ou s'il reste
+        # plus de SHRINK_SLACK pixels libres : un simple déplacement à l'intérieur ne repeint
+        # que l'ancien et le nouveau rectangle de l'outil
+        extent = QSize(max_width, max_height).expandedTo(self.layout().minimumSize())
+        if self.tools_extent is not None:
+            slack = self.tools_extent - extent
+            if 0 <= slack.width() <= self.SHRINK_SLACK and 0 <= slack.height() <= self.SHRINK_SLACK:
+                return
+        # Garder de la marge pour que les petits déplacements suivants ne redimensionnent pas
+        self.tools_extent = extent + QSize(self.SHRINK_SLACK // 2, self.SHRINK_SLACK // 2)
+        self.setMinimumSize(self.tools_extent)
+        self.resize(self.tools_extent)
 
 
-    def process_image(self, pil_image):
-        data = [
-            (r, g, b, self.TRANSPARENCY_ALPHA if (r, g, b) == (255, 255, 255) else a)
-            for r, g, b, a in pil_image.getdata()
-        ]
-        pil_image.putdata(data)
-        pil_image = ImageEnhance.Contrast(pil_image).enhance(2.0)
-        pil_image = ImageEnhance.Brightness(pil_image).enhance(1.2)
-        return QPixmap.fromImage(QImage(pil_image.tobytes("raw", "RGBA"), *pil_image.size, QImage.Format_RGBA8888))
+    @timed_stage("layout")
+    def fit_window_to_scene(self):
+        """
+        Redimensionne la fenêtre après un changement de taille de la vue du moteur "scene".
+        """
+        self.main_layout.activate()
+        self.layout().activate()
+        self.resize(self.sizeHint())
 
     def update_button_positions(self):
         '''
@@ -166,221 +2356,817 @@ class TransparentWindow(QMainWindow):
         """
         Crée une image composite en combinant deux outils (équerre et règle).
         Les images sont superposées avec une certaine distance.
-        """
-        image1 = Image.open(self.paths[key1]).convert("RGBA")
-        image2 = Image.open(self.paths[key2]).convert("RGBA")
-
-        # Définir une taille pour la nouvelle image composite
-        max_width = max(image1.width, image2.width)
-        total_height = image1.height + image2.height + 20  # +20 pour espacement
 
-        # Créer une image vide pour la combinaison
-        composite_image = Image.new("RGBA", (max_width, total_height), (255, 255, 255, 0))
+        La composition se fait entièrement en mémoire, à partir des images déjà traitées
+        et transformées (rotation, zoom) de chaque outil. Le résultat est conservé dans le
+        cache des images rendues, sous le même budget mémoire que les autres rendus.
 
-        # Coller les deux images sur la nouvelle image
-        composite_image.paste(image1, (0, 0))  # Coller la première image en haut
-        composite_image.paste(image2, (0, image1.height + 20))  # Coller la deuxième image en dessous
+        Returns:
+            QPixmap: Image composite.
+        """
+        frame_keys = [self.tool_states[key].frame_key(self.device_pixel_ratio) for key in (key1, key2)]
+        composite_key = (FrameCache.COMPOSITE, *frame_keys)
+        cached = self.frame_cache.get(composite_key)
+        if cached is not None:
+            return cached
+
+        pixmap1, pixmap2 = (self.get_frame(frame_key) for frame_key in frame_keys)
+        size1, size2 = logical_size(pixmap1), logical_size(pixmap2)
+
+        # Image transparente assez grande pour les deux outils, +20 pour espacement (en pixels logiques)
+        size = QSize(max(size1.width(), size2.width()), size1.height() + size2.height() + 20)
+        composite = QImage(size * self.device_pixel_ratio, QImage.Format_ARGB32_Premultiplied)
+        composite.setDevicePixelRatio(self.device_pixel_ratio)
+        composite.fill(Qt.transparent)
+
+        # Dessiner la première image en haut, la deuxième en dessous
+        painter = QPainter(composite)
+        painter.drawPixmap(0, 0, pixmap1)
+        painter.drawPixmap(0, size1.height() + 20, pixmap2)
+        painter.end()
+
+        composite_pixmap = QPixmap.fromImage(composite)
+        self.frame_cache.put(composite_key, composite_pixmap)
+        self.enforce_memory_budget()
+        return composite_pixmap
+
+    def trace_header(self):
+        """
+        État de départ d'un enregistrement d'événements : moteur de rendu, mode affiché, état
+        de chaque instance d'outil et ordre d'empilement du mode "Équerre + Règle".
 
-        # Sauvegarder temporairement l'image composite pour l'utiliser dans l'affichage
-        composite_path = "composite_image.png"
-        composite_image.save(composite_path)
-        self.paths["equerre + regle"] = composite_path
+        Les positions sont celles du moteur de rendu (coin du label, ou origine de l'outil
+        non transformé dans la scène) : l'enregistrement ne se rejoue qu'avec le même moteur.
+        """
+        return {
+            "backend": self.backend,
+            "mode": self.combo_box.currentText(),
+            "tools": {
+                name: [state.pos.x(), state.pos.y(), state.angle, state.scale, state.key]
+                for name, state in self.tool_states.items()
+            },
+            "stack": self.combined_tools(),
+        }
+
+    def restore_trace_header(self, header):
+        """
+        Remet la fenêtre dans l'état de départ d'un enregistrement, avant de le rejouer.
 
-    def switch_image(self, tool_name):
+        Raises:
+            ValueError: L'enregistrement a été fait avec un autre moteur de rendu.
+        """
+        backend = header.get("backend", self.backend)
+        if backend != self.backend:
+            raise ValueError(f"Enregistrement fait avec le moteur \"{backend}\", fenêtre en moteur \"{self.backend}\"")
+        for name in set(self.tool_z) - set(header.get("stack", self.tool_z)):
+            self.remove_tool(name)
+        for name, (x, y, angle, scale, *key) in header["tools"].items():
+            state = self.tool_states.setdefault(name, ToolState(key[0] if key else name))
+            state.pos = QPointF(x, y) if self.scene_view else QPoint(round(x), round(y))
+            state.angle, state.scale = angle, scale
+        for name in header.get("stack", ()):
+            self.tool_z[name] = self.next_z
+            self.next_z += 1
+        self.switch_image(header["mode"])
+
+    @timed_frame("switch_image")
+    def switch_image(self, tool_name, record=True):
+        # Une reprise différée (outils chargés entre-temps) n'est pas un nouveau changement de mode
+        if record and self.input_trace and tool_name in self.TOOL_MODES:
+            self.input_trace.record_mode(self.TOOL_MODES.index(tool_name))
+        # Outils pas encore traités : le mode actuel reste affiché jusqu'à ce qu'ils soient prêts
+        self.mode_generation += 1
+        key_map = {"Rapporteur": "rapporteur", "Équerre": "equerre", "Règle": "regle"}
+        if tool_name == "Équerre + Règle":
+            keys = tuple(dict.fromkeys(self.tool_states[name].key for name in self.combined_tools()))
+        else:
+            keys = (key_map.get(tool_name, "rapporteur"),)
+        missing = [key for key in keys if not self.tool_loaded(key)]
+        if missing:
+            self.pending_tool_keys = keys
+            for key in missing:
+                self.load_tool_in_background(key, lambda: self.switch_image(tool_name, record=False))
+            return
+        self.pending_tool_keys = ()
+
+        # Les transformations et rendus en attente concernent les outils de l'ancien mode
+        if self.pool:
+            self.pool.cancel_all(lambda channel: channel[0] == "frame")
+        self.scheduler.cancel()
+        self.refine_timer.stop()
+        self.interacting = False
+        self.preview_targets = {}
+        if self.scene_view:
+            self.scene_view.set_fast_preview(False)
+        self.tools_extent = None
+        self.setMinimumSize(0, 0)
         if tool_name == "Équerre + Règle":
             self.current_image_key = "equerre + regle"
 
-            # Charger et traiter les images de l'équerre et de la règle
-            equerre_image = Image.open(self.paths["equerre"]).convert("RGBA")
-            regle_image = Image.open(self.paths["regle"]).convert("RGBA")
-
-            equerre_pixmap = self.process_image(equerre_image)
-            regle_pixmap = self.process_image(regle_image)
-
-            # Configurer les labels individuels avec transparence
-            self.equerre_label.setPixmap(equerre_pixmap)
-            self.equerre_label.resize(equerre_pixmap.size())
-            self.equerre_label.move(50, 50)  # Position de départ pour l'équerre
-            self.equerre_label.show()
+            names = self.combined_tools()
+            if self.scene_view:
+                self.scene_view.set_tools({
+                    name: (self.get_tool_pyramid(self.tool_states[name].key), QPointF(self.tool_states[name].pos))
+                    for name in names
+                })
+                for name in names:
+                    self.scene_view.set_z(name, self.tool_z[name])
+                    self.transform_tool(self.scene_view.tool_items[name])
+                return
 
-            self.regle_label.setPixmap(regle_pixmap)
-            self.regle_label.resize(regle_pixmap.size())
-            self.regle_label.move(300, 150)  # Position de départ pour la règle
-            self.regle_label.show()
+            # Afficher chaque instance avec sa position et sa transformation, de la plus basse à la plus haute
+            self.tool_index.clear()
+            for name in names:
+                label = self.tool_label(name)
+                label.move(self.tool_states[name].pos)
+                self.transform_tool(label)
+                label.show()
+                label.raise_()
+            self.restack_overlays()
 
             # Masquer le label principal
             self.image_label.hide()
 
-            # Ajuster la taille de la fenêtre pour inclure les deux outils
+            # Ajuster la taille de la fenêtre pour inclure tous les outils
             self.adjust_window_size()
         else:
             # Afficher l'image unique dans le label principal
-            key_map = {"Rapporteur": "rapporteur", "Équerre": "equerre", "Règle": "regle"}
-            self.current_image_key = key_map.get(tool_name, "rapporteur")
+            self.current_image_key = keys[0]
 
             self.load_and_display_image()
 
             # Masquer les labels individuels
-            self.equerre_label.hide()
-            self.regle_label.hide()
-            self.image_label.show()
+            for label in self.tool_labels.values():
+                label.hide()
+            self.tool_index.clear()
+            if not self.scene_view:
+                self.image_label.show()
 
 
 
 
+    @timed_frame("update_displayed_image")
     def update_displayed_image(self):
         """
         Met à jour l'affichage de l'image avec les transformations appliquées (zoom, rotation).
         On part toujours de l'image d'origine pour éviter l'accumulation d'erreurs.
         """
+        if self.scene_view:
+            # Moteur "scene" : simple mise à jour de la transformation de l'item
+            state = self.tool_states[self.current_image_key]
+            if self.tool_loaded(state.key):
+                self.scene_view.set_pyramid(state.key, self.get_tool_pyramid(state.key))
+            else:
+                # Nouvelle résolution en préparation : l'ancienne pyramide sert d'aperçu
+                self.load_tool_in_background(state.key, self.update_displayed_image)
+            self.scene_view.set_tool_transform(state.key, state.angle, state.scale)
+            self.scene_view.anchor(state.key)
+            if self.scene_view.fit():
+                self.fit_window_to_scene()
+            self.request_input_mask()
+            return
 
-        # 1. Zoomer d'abord sur l'image d'origine
-        scaled_base = self.current_pixmap.scaled(
-            int(self.current_pixmap.width() * self.scale_factor[self.current_image_key]),
-            int(self.current_pixmap.height() * self.scale_factor[self.current_image_key]),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation,
-        )
+        # Image zoomée puis tournée, depuis le cache des images rendues si possible
+        self.request_frame(None, self.tool_states[self.current_image_key], self.show_image_pixmap)
+
+    def show_image_pixmap(self, pixmap):
+        """
+        Affiche une image rendue (QPixmap ou surface de rendu du label) dans le label principal.
+        """
+        with self.instrumentation.stage("layout"):
+            self.image_label.show_frame(pixmap, release=not self.interacting)
+            self.resize(self.image_label.width() + 90, self.image_label.height())
+        self.request_input_mask()
 
-        # 2. Appliquer la rotation autour du centre de l'image zoomée
-        transform = QTransform()
-        transform.translate(scaled_base.width() // 2, scaled_base.height() // 2)
-        transform.rotate(self.rotation_angle[self.current_image_key])
-        transform.translate(-scaled_base.width() // 2, -scaled_base.height() // 2)
+    def show_tool_pixmap(self, label, pixmap):
+        """
+        Affiche une image rendue (QPixmap ou surface de rendu du label) dans le label d'un
+        outil du mode "Équerre + Règle".
+        """
+        label.show_frame(pixmap, release=not self.interacting)
+        self.index_label(label)
+        self.adjust_window_size()
+        self.request_input_mask()
 
-        final_pixmap = scaled_base.transformed(transform, Qt.SmoothTransformation)
+    def render_tool_frame(self, key, angle, scale, device_pixel_ratio=1.0, mode=None):
+        """
+        Calcule l'image d'un outil tournée et zoomée, pour tous les modes.
 
-        # 3. Mettre à jour l'affichage
-        self.image_label.setPixmap(final_pixmap)
-        self.image_label.resize(final_pixmap.size())
-        self.resize(self.image_label.width() + 90, self.image_label.height())
+        L'image part du niveau de la pyramide de l'outil le plus proche du zoom, et une
+        seule transformation affine (rotation et reste du zoom) la rééchantillonne. Un outil
+        vectoriel est peint directement à l'angle et au zoom demandés.
+        Elle est calculée directement en pixels physiques de l'écran : Qt l'affiche
+        ensuite telle quelle, sans second rééchantillonnage.
 
+        Args:
+            key (str): Nom de l'outil.
+            angle (float): Angle de rotation, en degrés.
+            scale (float): Facteur de zoom.
+            device_pixel_ratio (float): Pixels physiques par pixel logique de l'écran.
+            mode (Qt.TransformationMode | None): Qualité imposée, sinon celle du geste en cours.
 
-    def scale_image(self, factor):
+        Returns:
+            QPixmap: Image rendue.
         """
-        Applique un zoom à l'image active (label principal ou outil sélectionné dans le mode "Équerre + Règle").
+        mode = self.transformation_mode() if mode is None else mode
+        if key in self.vector_tools:
+            smooth = mode == Qt.SmoothTransformation
+            pixmap = QPixmap.fromImage(self.vector_tools[key].render(angle, scale * device_pixel_ratio, smooth))
+        else:
+            pixmap = self.get_tool_pyramid(key).transformed(angle, scale * device_pixel_ratio, mode)
+        if device_pixel_ratio != 1:
+            pixmap = QPixmap(pixmap)  # Le niveau de la pyramide peut être renvoyé tel quel : ne pas le modifier
+            pixmap.setDevicePixelRatio(device_pixel_ratio)
+        return pixmap
+
+    def render_frame(self, frame_key, mode=None):
         """
-        if self.current_image_key == "equerre + regle" and self.active_label:
-            # Zoom sur l'équerre ou la règle selon l'outil actif
-            if self.active_label == self.equerre_label:
-                key = "equerre"
-            elif self.active_label == self.regle_label:
-                key = "regle"
-            else:
-                return
+        Calcule l'image correspondant à une clé du cache des images rendues.
+        """
+        with self.instrumentation.stage("transform"):
+            return self.render_tool_frame(*frame_key, mode=mode)
 
-            # Appliquer le zoom
-            pixmap = QPixmap(self.paths[key])
-            scaled_pixmap = pixmap.scaled(
-                int(pixmap.width() * self.scale_factor[key] * factor),
-                int(pixmap.height() * self.scale_factor[key] * factor),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation,
+    def render_preview(self, label, frame_key):
+        """
+        Calcule l'aperçu rapide d'un outil dans la surface de rendu réutilisée du label :
+        pendant un geste, aucune image n'est allouée par rendu.
+
+        Args:
+            label (FrameLabel): Label qui affichera l'aperçu.
+            frame_key (tuple): Voir ToolState.frame_key.
+
+        Returns:
+            QPixmap | RenderTarget: Surface de rendu, ou niveau de la pyramide s'il convient tel quel.
+        """
+        key, angle, scale, device_pixel_ratio = frame_key
+        target = label.render_target
+        allocations = target.allocations
+        size = self.source_size(key)
+        target.reserve_rotations(size.width() * scale * device_pixel_ratio, size.height() * scale * device_pixel_ratio)
+        if target.allocations != allocations:
+            # Les surfaces d'aperçu comptent dans le budget mémoire global
+            self.enforce_memory_budget()
+        with self.instrumentation.stage("transform"):
+            if key in self.vector_tools:
+                tool = self.vector_tools[key]
+                size = tool.render_size(angle, scale * device_pixel_ratio)
+                painter = target.begin(size, device_pixel_ratio)
+                tool.paint(painter, size, angle, scale * device_pixel_ratio, smooth=False)
+                painter.end()
+                return target
+            level, transform = self.get_tool_pyramid(key).level_transform(angle, scale * device_pixel_ratio)
+            if transform is None:
+                return self.render_tool_frame(*frame_key)
+            target.paint_pixmap(level, transform, Qt.FastTransformation, device_pixel_ratio)
+        return target
+
+    def request_frame(self, target, state, display):
+        """
+        Affiche l'image rendue d'un outil sans bloquer l'interface.
+
+        Une image en cache est affichée tout de suite ; pendant un geste, un aperçu rapide
+        est peint dans la surface de rendu du label. Sinon un aperçu rapide est affiché et
+        le rendu lissé est calculé dans le pool ; il remplace l'aperçu s'il correspond
+        toujours à l'état de l'outil. Une demande plus récente pour la même cible rend la
+        précédente caduque.
+
+        Args:
+            target: None pour l'image principale, sinon le label de l'outil.
+            state (ToolState): État de l'instance d'outil à afficher.
+            display (callable): Fonction `display(pixmap)` qui affiche l'image.
+        """
+        frame_key = state.frame_key(self.device_pixel_ratio)
+        key, angle, scale, device_pixel_ratio = frame_key
+        label = self.image_label if target is None else target
+        if self.interacting and frame_key not in self.frame_cache and self.tool_loaded(key):
+            if self.pool:
+                self.pool.cancel(("frame", target))
+            display(self.render_preview(label, frame_key))
+            return
+        if self.pool is None or key in self.vector_tools:
+            # Rendu vectoriel : une seule peinture, pas de rééchantillonnage à déporter
+            display(self.get_frame(frame_key))
+            return
+        channel = ("frame", target)
+        if not self.tool_loaded(key):
+            # Nouvelle résolution de décodage nécessaire : l'image actuelle reste affichée
+            self.pool.cancel(channel)
+            self.load_tool_in_background(key, lambda: self.request_frame(target, state, display))
+            return
+        if frame_key in self.frame_cache:
+            self.pool.cancel(channel)
+            display(self.get_frame(frame_key))
+            return
+
+        display(self.render_preview(label, frame_key))
+        self.pool.submit(channel, self.frame_job(frame_key),
+                         lambda rendered: self.frame_rendered(state, frame_key, rendered, display))
+
+    def frame_job(self, frame_key):
+        """
+        Prépare le rendu lissé d'une image matricielle, à exécuter dans le pool. Les outils
+        vectoriels sont peints dans le thread de l'interface : leurs tracés sont partagés.
+
+        Returns:
+            callable: Fonction sans argument qui renvoie le rendu sur une QImage (les QPixmap
+            ne quittent pas le thread de l'interface).
+        """
+        key, angle, scale, device_pixel_ratio = frame_key
+        level, transform = self.get_tool_pyramid(key).level_transform(angle, scale * device_pixel_ratio)
+        image = level.toImage()
+        return functools.partial(image.transformed, transform, Qt.SmoothTransformation) if transform else image.copy
+
+    def store_frame(self, frame_key, image):
+        """
+        Met en cache un rendu lissé calculé en arrière-plan.
+
+        Returns:
+            QPixmap: Image mise en cache.
+        """
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(frame_key[3])
+        self.frame_cache.put(frame_key, pixmap)
+        self.enforce_memory_budget()
+        return pixmap
+
+    def frame_rendered(self, state, frame_key, image, display):
+        """
+        Reçoit un rendu lissé calculé en arrière-plan : il est mis en cache, et affiché s'il
+        correspond toujours à l'état de l'outil.
+        """
+        pixmap = self.store_frame(frame_key, image)
+        if frame_key == state.frame_key(self.device_pixel_ratio):
+            display(pixmap)
+            self.schedule_prerender(frame_key)
+
+    def get_frame(self, frame_key):
+        """
+        Retourne une image rendue, depuis le cache si possible.
+
+        Seuls les rendus lissés sont mis en cache ; pendant un geste, une image lissée
+        déjà en cache est réutilisée plutôt que de calculer un aperçu rapide.
+
+        Args:
+            frame_key (tuple): (outil, angle quantifié, zoom quantifié, ratio de l'écran), voir ToolState.frame_key.
+
+        Returns:
+            QPixmap: Image rendue.
+        """
+        pixmap = self.frame_cache.get(frame_key)
+        if pixmap is None:
+            pixmap = self.render_frame(frame_key)
+            if not self.interacting:
+                self.frame_cache.put(frame_key, pixmap)
+                self.enforce_memory_budget()
+        if not self.interacting:
+            self.schedule_prerender(frame_key)
+        return pixmap
+
+    def schedule_prerender(self, frame_key):
+        """
+        Prépare le pré-calcul, pendant l'inactivité, des angles voisins de l'image affichée.
+        """
+        key, angle, scale, device_pixel_ratio = frame_key
+        self.prerender_queue = [
+            neighbour for neighbour in (
+                (key, FrameCache.quantize_angle(angle + delta), scale, device_pixel_ratio) for delta in self.PRERENDER_ANGLES
             )
+            if neighbour not in self.frame_cache
+        ]
+        if self.prerender_queue:
+            self.prerender_timer.start(self.PRERENDER_DELAY_MS)
 
-            # Mettre à jour le label et la taille de l'outil
-            self.scale_factor[key] *= factor
-            self.active_label.setPixmap(scaled_pixmap)
-            self.active_label.resize(scaled_pixmap.size())
+    def prerender_step(self):
+        """
+        Pré-calcule une image de la file, puis rend la main à la boucle d'événements.
 
-            # Ajuster la fenêtre pour inclure l'outil redimensionné
-            self.adjust_window_size()
+        Avec le pool, une image matricielle est rendue en arrière-plan et l'image suivante
+        n'est lancée qu'à la réception de la précédente.
+        """
+        if self.interacting or not self.prerender_queue:
+            return
+        frame_key = self.prerender_queue.pop(0)
+        if frame_key in self.frame_cache:
+            pass
+        elif self.pool is None or frame_key[0] in self.vector_tools:
+            self.frame_cache.put(frame_key, self.render_frame(frame_key))
+            self.enforce_memory_budget()
+        elif self.tool_loaded(frame_key[0]):
+            self.pool.submit(("prerender",), self.frame_job(frame_key), lambda image: self.frame_prerendered(frame_key, image))
+            return
+        if self.prerender_queue:
+            self.prerender_timer.start(0)
+
+    def frame_prerendered(self, frame_key, image):
+        """
+        Reçoit une image pré-calculée en arrière-plan et lance la suivante.
+        """
+        self.store_frame(frame_key, image)
+        if self.prerender_queue:
+            self.prerender_timer.start(0)
+
+
+    def scale_image(self, factor):
+        """
+        Applique un zoom à l'image active (label principal ou outil sélectionné dans le mode "Équerre + Règle").
+        """
+        if self.current_image_key == "equerre + regle" and self.active_label:
+            # Zoom sur l'équerre ou la règle selon l'outil actif
+            self.transform_tool(self.active_label, factor=factor)
         else:
             # Zoom sur l'image principale dans les autres modes
-            self.scale_factor[self.current_image_key] *= factor
+            self.tool_states[self.current_image_key].scale *= factor
             self.update_displayed_image()
 
+    @timed_frame("transform_tool")
+    def transform_tool(self, tool, angle=0, factor=1):
+        """
+        Applique une rotation et un zoom à un outil du mode "Équerre + Règle", en un seul rendu.
+
+        Args:
+            tool: Label ou item de l'outil.
+            angle (float): Rotation ajoutée, en degrés.
+            factor (float): Facteur de zoom appliqué.
+        """
+        name = self.tool_key(tool)
+        if name is None:
+            return
+        state = self.tool_states[name]
+        state.angle += angle
+        state.scale *= factor
+
+        if self.scene_view:
+            # Moteur "scene" : simple transformation de l'item, sans nouvelle image
+            if self.tool_loaded(state.key):
+                self.scene_view.set_pyramid(name, self.get_tool_pyramid(state.key))
+            else:
+                # Nouvelle résolution en préparation : l'ancienne pyramide sert d'aperçu
+                self.load_tool_in_background(state.key, lambda: name in self.scene_view.tool_items and self.transform_tool(tool))
+            self.scene_view.set_tool_transform(name, state.angle, state.scale)
+            # Ajuster la fenêtre pour inclure l'outil transformé
+            self.adjust_window_size()
+            self.request_input_mask()
+        else:
+            # Image rendue depuis le cache si possible, fenêtre ajustée à l'affichage
+            self.request_frame(tool, state, lambda pixmap: self.show_tool_pixmap(tool, pixmap))
 
     def rotate_image(self, angle):
-        self.rotation_angle[self.current_image_key] += angle
-        # self.update_tool_image(tool_key)
+        if self.current_image_key == "equerre + regle":
+            # Rotation de l'outil actif uniquement
+            if self.active_label:
+                self.transform_tool(self.active_label, angle)
+            return
+        self.tool_states[self.current_image_key].angle += angle
         self.update_displayed_image()
 
     def keyPressEvent(self, event):
+        self.instrumentation.count_event()
+        if event.key() == Qt.Key_F3:
+            self.toggle_stats_overlay()
+            return
+        if event.key() == Qt.Key_D:
+            self.toggle_drawing()
+            return
+        if event.key() == Qt.Key_Z and event.modifiers() & Qt.ControlModifier:
+            self.canvas.undo()  # Annuler le dernier trait
+            self.request_input_mask()
+            return
+        if event.key() == Qt.Key_Delete and self.drawing:
+            self.canvas.clear()  # Effacer tous les traits
+            return
+        if self.current_image_key == "equerre + regle" and not self.drawing:
+            # Ajout d'un outil (1 : rapporteur, 2 : équerre, 3 : règle), retrait de l'outil actif
+            new_tools = {Qt.Key_1: "rapporteur", Qt.Key_2: "equerre", Qt.Key_3: "regle"}
+            if event.key() in new_tools:
+                self.add_tool(new_tools[event.key()])
+                return
+            if event.key() == Qt.Key_Delete and self.active_label:
+                self.remove_tool(self.tool_key(self.active_label))
+                return
+
+        # Les transformations passent par le planificateur : les répétitions automatiques
+        # d'une touche maintenue sont regroupées en un seul rendu par image
+        if event.key() in (Qt.Key_Plus, Qt.Key_Minus, Qt.Key_Left, Qt.Key_Right):
+            self.begin_interaction()  # Aperçu rapide tant que la touche est maintenue
+
         if event.key() == Qt.Key_Plus:
-            self.scale_image(1.1)  # Zoom avant
+            self.schedule_scale(1.1)  # Zoom avant
         elif event.key() == Qt.Key_Minus:
-            self.scale_image(0.9)  # Zoom arrière
+            self.schedule_scale(0.9)  # Zoom arrière
         elif event.key() == Qt.Key_Left:
             if self.current_image_key != "equerre + regle":
-                self.rotate_image(-1)  # Rotation de l'image principale
+                self.scheduler.rotate(None, -1)  # Rotation de l'image principale
         elif event.key() == Qt.Key_Right:
             if self.current_image_key != "equerre + regle":
-                self.rotate_image(1)  # Rotation de l'image principale
+                self.scheduler.rotate(None, 1)  # Rotation de l'image principale
+        elif event.key() in (Qt.Key_Return, Qt.Key_Enter):
+            # Rotation de 180° pour l'image principale, ou pour l'outil actif uniquement
+            self.schedule_rotation(180)
         elif event.key() == Qt.Key_Space:
-            if self.current_image_key == "equerre + regle":
-                # Rotation de 180° pour l'outil actif uniquement
-                if self.active_label:
-                    self.rotate_label(self.active_label, 180)
-            else:
-                self.rotate_image(180)  # Rotation de 180° pour l'image principale
+            self.toggle_click_through()
         elif event.key() == Qt.Key_M:
-            if self.current_image_key == "equerre + regle":
-                # Rotation de 90° pour l'outil actif uniquement
-                if self.active_label:
-                    self.rotate_label(self.active_label, 90)
-            else:
-                self.rotate_image(90)  # Rotation de 90° pour l'image principale
+            # Rotation de 90° pour l'image principale, ou pour l'outil actif uniquement
+            self.schedule_rotation(90)
         elif event.key() == Qt.Key_Escape:
             self.confirm_exit()  # Quitter l'application
 
-    def apply_transparency(self, pil_image):
+    def schedule_rotation(self, angle):
         """
-        Applique la transparence à une image Pillow en rendant les pixels blancs ou proches du blanc semi-transparents.
+        Demande une rotation de l'image principale, ou de l'outil actif en mode "Équerre + Règle".
         """
-        data = []
-        for r, g, b, a in pil_image.getdata():
-            # Si le pixel est blanc ou proche du blanc, appliquer la transparence
-            if (r, g, b) == (255, 255, 255):
-                data.append((r, g, b, self.TRANSPARENCY_ALPHA))
-            else:
-                data.append((r, g, b, a))
-        pil_image.putdata(data)
-        return pil_image
+        if self.current_image_key != "equerre + regle":
+            self.scheduler.rotate(None, angle)
+        elif self.active_label:
+            self.scheduler.rotate(self.active_label, angle)
 
+    def schedule_scale(self, factor):
+        """
+        Demande un zoom de l'image principale, ou de l'outil actif en mode "Équerre + Règle".
+        """
+        if self.current_image_key != "equerre + regle":
+            self.scheduler.scale(None, factor)
+        elif self.active_label:
+            self.scheduler.scale(self.active_label, factor)
 
-    def rotate_label(self, label, angle):
+    @timed_frame("scheduled_render")
+    def apply_pending_render(self, target, angle, factor, pos):
         """
-        Applique une rotation à un label spécifique (équerre ou règle) tout en conservant la transparence.
+        Applique en une fois les transformations accumulées par le planificateur pour une cible.
+
+        Args:
+            target: None pour l'image principale, sinon l'outil (label ou item) concerné.
+            angle (float): Rotation cumulée, en degrés.
+            factor (float): Facteur de zoom cumulé.
+            pos (QPoint | None): Dernière position demandée pour l'outil.
         """
-        # Identifier la clé de l'outil actif
-        if label == self.equerre_label:
-            key = "equerre"
-        elif label == self.regle_label:
-            key = "regle"
-        else:
+        if target is None:
+            state = self.tool_states[self.current_image_key]
+            state.angle += angle
+            state.scale *= factor
+            self.update_displayed_image()
+            self.note_preview(target, self.update_displayed_image)
             return
 
-        # Charger l'image d'origine
-        pil_image = Image.open(self.paths[key]).convert("RGBA")
+        if angle or factor != 1:
+            self.transform_tool(target, angle, factor)
+            self.note_preview(target, lambda: self.transform_tool(target))
+        if pos is not None:
+            self.move_tool(target, pos)
+            self.adjust_window_size()
 
-        # Réappliquer la transparence au cas où il y ait des pixels blancs
-        pil_image = self.apply_transparency(pil_image)
+    def transformation_mode(self):
+        """
+        Qualité des transformations Qt : rapide pendant un geste, lissée sinon.
+        """
+        return Qt.FastTransformation if self.interacting else Qt.SmoothTransformation
 
-        # Effectuer la rotation en définissant un fond transparent
-        new_angle = self.rotation_angle[key] + angle
-        rotated_image = pil_image.rotate(
-            new_angle,
-            resample=Image.BICUBIC,
-            expand=True,
-            fillcolor=(0, 0, 0, 0)  # Fond 100 % transparent
-        )
+    def begin_interaction(self):
+        """
+        Signale un geste en cours (glisser, rotation, touche maintenue) : les rendus passent
+        en qualité rapide jusqu'au relâchement ou à une courte inactivité.
+        """
+        self.prerender_timer.stop()
+        if self.pool:
+            self.pool.cancel(("prerender",))
+        if not self.interacting:
+            self.interacting = True
+            if self.scene_view:
+                self.scene_view.set_fast_preview(True)
+        self.refine_timer.start()
+
+    def end_interaction(self):
+        """
+        Termine le geste en cours et remplace les aperçus rapides par un unique rendu lissé.
+        """
+        self.refine_timer.stop()
+        if not self.interacting:
+            return
+        self.interacting = False
+        if self.scene_view:
+            self.scene_view.set_fast_preview(False)
+
+        # Les transformations en attente sont rendues directement en qualité lissée
+        self.scheduler.flush()
+        previews, self.preview_targets = self.preview_targets, {}
+        for refine in previews.values():
+            refine()
+        # Masque exact, calculé une fois le geste terminé
+        self.request_input_mask()
+
+    def note_preview(self, target, refine):
+        """
+        Mémorise le rendu lissé à refaire pour une cible affichée en aperçu rapide.
+        """
+        if self.interacting and not self.scene_view:
+            self.preview_targets[target] = refine
+        else:
+            self.preview_targets.pop(target, None)
 
-        # Convertir en QPixmap
-        rotated_pixmap = QPixmap.fromImage(
-            QImage(rotated_image.tobytes("raw", "RGBA"), rotated_image.width, rotated_image.height, QImage.Format_RGBA8888)
-        )
+    def tool_at(self, pos):
+        """
+        Retourne l'outil (label, ou item du moteur "scene") situé sous `pos`, ou None.
+        """
+        if self.scene_view:
+            return self.scene_view.tool_at(self.scene_view.mapFrom(self, pos))
+        # Seuls les outils dont le rectangle contient le point sont testés, du plus haut au plus bas
+        for name in sorted(self.tool_index.at(pos), key=self.tool_z.get, reverse=True):
+            label = self.tool_labels[name]
+            if self.label_hit(label, pos):
+                return label
+        return None
+
+    def label_hit(self, label, pos):
+        """
+        Indique si `pos` (coordonnées de la fenêtre) tombe sur une partie visible de l'outil
+        affiché par un label, et non sur un coin transparent de son rectangle englobant.
+        """
+        state = self.tool_states[self.tool_key(label)]
+        key = state.key
+        if key in self.vector_tools:
+            pyramid = self.get_tool_pyramid(key)  # Construite sans décodage
+        else:
+            pyramid = self.pyramids.get((key, self.tool_params(key)))
+        if pyramid is None:
+            # Outil en cours de chargement : n'importe quelle version fait l'affaire
+            pyramid = next((p for pyramid_key, p in self.pyramids.items() if pyramid_key[0] == key), None)
+            if pyramid is None:
+                return True
+        # L'image est centrée dans le label : inverser la rotation et le zoom autour du centre
+        _, angle, scale, _ = state.frame_key()
+        to_tool, invertible = QTransform().rotate(angle).scale(scale, scale).inverted()
+        if not invertible:
+            return False
+        center = QPointF(label.x() + label.width() / 2, label.y() + label.height() / 2)
+        local = to_tool.map(QPointF(pos) - center) + ToolScene.full_center(pyramid)
+        return pyramid.hit_mask.contains(local.x(), local.y())
+
+    def tool_key(self, tool):
+        """
+        Retourne le nom de l'instance d'outil ("equerre", "regle", "regle-2"...) associée à un label ou à un item.
+        """
+        if tool in self.label_names:
+            return self.label_names[tool]
+        if self.scene_view:
+            return self.scene_view.key_of(tool)
+        return None
+
+    def tool_pos(self, tool):
+        """
+        Position de l'outil dans les coordonnées de la fenêtre.
+        """
+        if self.scene_view:
+            return self.scene_view.mapTo(self, self.scene_view.mapFromScene(tool.pos()))
+        return tool.pos()
+
+    def move_tool(self, tool, pos):
+        """
+        Déplace un outil à une position donnée dans les coordonnées de la fenêtre.
+        """
+        name = self.tool_key(tool)
+        state = self.tool_states[name]
+        if self.scene_view:
+            tool.setPos(self.scene_view.mapToScene(self.scene_view.mapFrom(self, pos)))
+            state.pos = self.scene_view.origin(name)
+        else:
+            tool.move(pos)
+            state.pos = pos
+            self.index_label(tool)
+        self.request_input_mask()
+
+    def combined_tools(self):
+        """
+        Noms des instances d'outils du mode "Équerre + Règle", de la plus basse à la plus haute.
+        """
+        return sorted(self.tool_z, key=self.tool_z.get)
+
+    def tool_label(self, name):
+        """
+        Retourne le label d'une instance d'outil (moteur "label"), créé au premier besoin.
+        """
+        label = self.tool_labels.get(name)
+        if label is None:
+            label = FrameLabel(self)
+            self.tool_labels[name] = label
+            self.label_names[label] = name
+        return label
+
+    def index_label(self, label):
+        """
+        Met à jour le rectangle d'un label d'outil dans l'index spatial.
+        """
+        name = self.label_names[label]
+        if name in self.tool_z and self.current_image_key == "equerre + regle":
+            self.tool_index.update(name, label.geometry())
 
-        # Mettre à jour le label
-        label.setPixmap(rotated_pixmap)
-        label.resize(rotated_pixmap.size())
+    def add_tool(self, key):
+        """
+        Ajoute une instance d'un outil au mode "Équerre + Règle", au-dessus des autres et au
+        premier emplacement libre. Elle devient l'outil actif.
 
-        # Mettre à jour l'angle
-        self.rotation_angle[key] = new_angle
+        Args:
+            key (str): Outil ("rapporteur", "equerre" ou "regle").
 
+        Returns:
+            str | None: Nom de la nouvelle instance (None si l'outil est en cours de chargement).
+        """
+        if not self.tool_loaded(key):
+            self.load_tool_in_background(key, lambda: self.add_tool(key))
+            return None
+        self.instance_count += 1
+        name = f"{key}-{self.instance_count}"
+        state = ToolState(key, scale=self.tool_states[key].scale)
+        state.pos = self.free_position(state)
+        self.tool_states[name] = state
+        self.tool_z[name] = self.next_z
+        self.next_z += 1
+
+        if self.scene_view:
+            tool = self.scene_view.add_tool(name, self.get_tool_pyramid(key), QPointF(state.pos), self.tool_z[name])
+            self.transform_tool(tool)
+        else:
+            tool = self.tool_label(name)
+            tool.move(state.pos)
+            tool.show()
+            self.transform_tool(tool)
+            tool.raise_()
+            self.restack_overlays()
+        self.active_label = tool
+        return name
+
+    def free_position(self, state):
+        """
+        Premier emplacement, en cascade depuis le coin supérieur gauche, où un nouvel outil
+        ne chevauche aucun autre (recherche par l'index spatial).
+        """
+        size = QSizeF(self.source_size(state.key)) * state.scale
+        step = 40
+        pos = QPoint(20, 20)
+        for attempt in range(32):
+            pos = QPoint(20 + attempt * step, 20 + attempt * step)
+            if self.scene_view:
+                taken = self.scene_view.overlaps(QRectF(QPointF(pos), size))
+            else:
+                taken = self.tool_index.overlapping(QRect(pos, size.toSize()))
+            if not taken:
+                break
+        return pos
 
+    def remove_tool(self, name):
+        """
+        Retire une instance d'outil du mode "Équerre + Règle". L'équerre et la règle d'origine
+        gardent leur état, utilisé aussi par leurs modes individuels.
+        """
+        if name not in self.tool_z:
+            return
+        del self.tool_z[name]
+        if self.scene_view:
+            # Les items de la scène ne sont ceux des instances que dans le mode "Équerre + Règle"
+            tool = self.scene_view.tool_items.get(name) if self.current_image_key == "equerre + regle" else None
+            if tool is not None:
+                self.scene_view.remove_tool(name)
+        else:
+            tool = self.tool_labels[name]
+            tool.hide()
+            self.tool_index.remove(name)
+            if name not in self.paths:
+                del self.tool_labels[name]
+                del self.label_names[tool]
+                tool.deleteLater()
+        if tool is not None:
+            # Transformations et rendus en attente pour cet outil
+            self.scheduler.pending.pop(tool, None)
+            self.preview_targets.pop(tool, None)
+            if self.pool:
+                self.pool.cancel(("frame", tool))
+        if name not in self.paths:
+            del self.tool_states[name]
+        for attribute in ("active_label", "dragged_label", "is_rotating_label"):
+            if tool is not None and getattr(self, attribute) is tool:
+                setattr(self, attribute, None)
+        if self.current_image_key == "equerre + regle":
+            self.adjust_window_size()
+        self.request_input_mask()
 
+    def raise_tool(self, tool):
+        """
+        Place un outil du mode "Équerre + Règle" au-dessus des autres.
+        """
+        name = self.tool_key(tool)
+        self.tool_z[name] = self.next_z
+        self.next_z += 1
+        if self.scene_view:
+            self.scene_view.set_z(name, self.tool_z[name])
+        else:
+            tool.raise_()
+            self.restack_overlays()
 
+    def restack_overlays(self):
+        """
+        Garde le calque de dessin et l'affichage des mesures au-dessus des labels d'outils.
+        """
+        self.canvas.raise_()
+        if self.stats_overlay.isVisible():
+            self.stats_overlay.raise_()
 
     def confirm_exit(self):
         msg_box = QMessageBox(self)
@@ -392,20 +3178,21 @@ class TransparentWindow(QMainWindow):
             self.close()
 
     def mousePressEvent(self, event):
+        self.instrumentation.count_event()
+        if self.drawing:
+            if event.button() == Qt.LeftButton:
+                self.canvas.begin_stroke(event.pos())
+            return
         if event.button() == Qt.LeftButton:
             # Mode "Équerre + Règle" : sélectionner un outil pour le déplacement ou le zoom
             if self.current_image_key == "equerre + regle":
-                if self.equerre_label.geometry().contains(event.pos()):
-                    self.dragged_label = self.equerre_label
-                    self.active_label = self.equerre_label  # L'équerre devient l'outil actif
-                    self.offset = event.pos() - self.equerre_label.pos()
-                elif self.regle_label.geometry().contains(event.pos()):
-                    self.dragged_label = self.regle_label
-                    self.active_label = self.regle_label  # La règle devient l'outil actif
-                    self.offset = event.pos() - self.regle_label.pos()
-                else:
-                    self.dragged_label = None
-                    self.active_label = None
+                tool = self.tool_at(event.pos())
+                # L'outil cliqué devient l'outil actif
+                self.dragged_label = tool
+                self.active_label = tool
+                if tool is not None:
+                    self.raise_tool(tool)
+                    self.offset = event.pos() - self.tool_pos(tool)
             else:
                 # Mode avec une seule image : préparer le déplacement de la fenêtre entière
                 self.offset = event.globalPos() - self.frameGeometry().topLeft()
@@ -414,12 +3201,7 @@ class TransparentWindow(QMainWindow):
         elif event.button() == Qt.RightButton:
             # Activer la rotation
             if self.current_image_key == "equerre + regle":
-                if self.equerre_label.geometry().contains(event.pos()):
-                    self.is_rotating_label = self.equerre_label
-                elif self.regle_label.geometry().contains(event.pos()):
-                    self.is_rotating_label = self.regle_label
-                else:
-                    self.is_rotating_label = None
+                self.is_rotating_label = self.tool_at(event.pos())
                 self.last_mouse_pos = event.globalPos()
             else:
                 self.is_rotating = True
@@ -427,12 +3209,17 @@ class TransparentWindow(QMainWindow):
 
 
     def mouseMoveEvent(self, event):
+        self.instrumentation.count_event()
+        if self.drawing:
+            if event.buttons() == Qt.LeftButton:
+                self.canvas.extend_stroke(event.pos())
+            return
         if event.buttons() == Qt.LeftButton:
             # Déplacement d'un outil (équerre ou règle)
             if self.dragged_label:
-                self.dragged_label.move(event.pos() - self.offset)
-                if self.current_image_key == "equerre + regle":
-                    self.adjust_window_size()  # Ajuster la fenêtre dynamiquement
+                # Le déplacement et l'ajustement de la fenêtre sont faits au prochain rendu
+                self.begin_interaction()
+                self.scheduler.move(self.dragged_label, event.pos() - self.offset)
             # Déplacement de la fenêtre dans les modes individuels
             elif self.offset and self.current_image_key != "equerre + regle":
                 self.move(event.globalPos() - self.offset)
@@ -441,46 +3228,317 @@ class TransparentWindow(QMainWindow):
             if self.is_rotating_label:
                 delta = event.globalPos() - self.last_mouse_pos
                 self.last_mouse_pos = event.globalPos()
-                # Rotation et réapplication de la transparence
-                self.rotate_label(self.is_rotating_label, delta.x() * 0.2)
+                # Rotation cumulée jusqu'au prochain rendu, en aperçu rapide
+                self.begin_interaction()
+                self.scheduler.rotate(self.is_rotating_label, delta.x() * 0.2)
             elif self.is_rotating:
                 # Rotation de l'image principale dans les autres modes
                 delta = event.globalPos() - self.last_mouse_pos
                 self.last_mouse_pos = event.globalPos()
-                self.rotate_image(delta.x() * 0.2)
+                self.begin_interaction()
+                self.scheduler.rotate(None, delta.x() * 0.2)
 
 
     def mouseReleaseEvent(self, event):
+        self.instrumentation.count_event()
+        if self.drawing:
+            if event.button() == Qt.LeftButton:
+                self.canvas.end_stroke()
+            return
         if event.button() == Qt.LeftButton:
             self.dragged_label = None
             self.offset = None
         elif event.button() == Qt.RightButton:
             self.is_rotating = False
             self.is_rotating_label = None
+        # Fin du geste : un seul rendu en haute qualité
+        self.end_interaction()
 
 
-    def center_window(self):
-        screen = QApplication.desktop().screenGeometry()
-        self.move((screen.width() - self.width()) // 2, (screen.height() - self.height()) // 2)
+    def toggle_drawing(self):
+        """
+        Active ou désactive le mode dessin : la souris trace au lieu de déplacer les outils.
+        """
+        self.end_interaction()
+        # Un trait en cours est terminé : sinon son point de reprise serait perdu
+        self.canvas.end_stroke()
+        self.drawing = not self.drawing
+        self.dragged_label = None
+        self.is_rotating = False
+        self.is_rotating_label = None
+        self.setCursor(Qt.CrossCursor if self.drawing else Qt.ArrowCursor)
+        self.canvas.raise_()
+        if self.stats_overlay.isVisible():
+            self.stats_overlay.raise_()
+        # Le dessin a besoin de toute la fenêtre : pas de clic à travers pendant le mode dessin
+        if self.drawing and self.click_through:
+            self.toggle_click_through()
+
+    def toggle_click_through(self):
+        """
+        Active ou désactive le mode clic à travers : les clics sur les zones transparentes
+        de la fenêtre atteignent les fenêtres situées dessous.
+        """
+        self.click_through = not self.click_through
+        if self.click_through and self.drawing:
+            self.toggle_drawing()
+        self.apply_input_mask()
+
+    def request_input_mask(self):
+        """
+        Demande la mise à jour du masque de saisie au prochain passage de la boucle d'événements.
+        """
+        if self.click_through:
+            self.mask_timer.start(0)
+
+    def input_region(self, frame_key):
+        """
+        Région des pixels visibles d'une image rendue, calculée une seule fois par outil,
+        angle et zoom quantifiés.
+
+        Pendant un geste, une région absente du cache n'est pas calculée : None est renvoyé
+        et le rectangle de l'outil sert de masque jusqu'à la fin du geste. Avec le pool, la
+        région est calculée en arrière-plan, une fois l'image lissée disponible, et le
+        masque est mis à jour à sa réception.
+
+        Returns:
+            tuple | None: (QRegion en pixels logiques, taille logique de l'image rendue).
+        """
+        cached = self.input_regions.get(frame_key)
+        if cached is not None:
+            self.input_regions.move_to_end(frame_key)
+            return cached
+        if self.interacting:
+            return None
+        if self.pool is None:
+            pixmap = self.get_frame(frame_key)
+            return self.store_input_region(frame_key, alpha_mask(pixmap.toImage(), self.TRANSPARENCY_ALPHA), pixmap)
+        # Image lissée pas encore rendue : le masque sera redemandé à son affichage
+        channel = ("input_mask", frame_key)
+        if frame_key in self.frame_cache and not self.pool.pending(channel):
+            pixmap = self.frame_cache.get(frame_key)
+            job = functools.partial(alpha_mask, pixmap.toImage(), self.TRANSPARENCY_ALPHA)
+            self.pool.submit(channel, job, lambda mask: self.input_region_ready(frame_key, mask, pixmap))
+        return None
+
+    def input_region_ready(self, frame_key, mask, pixmap):
+        """
+        Reçoit un masque calculé en arrière-plan et met à jour le masque de la fenêtre.
+        """
+        self.store_input_region(frame_key, mask, pixmap)
+        self.request_input_mask()
+
+    def store_input_region(self, frame_key, mask, pixmap):
+        """
+        Convertit le masque d'une image rendue en région, en pixels logiques, et la met en cache.
 
+        Returns:
+            tuple: (QRegion, taille logique de l'image rendue).
+        """
+        cached = (mask_region(mask, pixmap.devicePixelRatio()), logical_size(pixmap))
+        self.input_regions[frame_key] = cached
+        while len(self.input_regions) > self.MAX_INPUT_REGIONS:
+            self.input_regions.popitem(last=False)
+        return cached
+
+    def displayed_tools(self):
+        """
+        Outils affichés et rectangle qu'ils occupent dans la fenêtre.
+
+        Returns:
+            list: (ToolState, QRectF) ; l'image rendue de l'outil est centrée dans le rectangle.
+        """
+        if self.scene_view:
+            origin = self.scene_view.mapTo(self, QPoint(0, 0))
+            return [
+                (self.tool_states[name],
+                 QRectF(self.scene_view.mapFromScene(item.sceneBoundingRect()).boundingRect().translated(origin)))
+                for name, item in self.scene_view.tool_items.items()
+            ]
+        if self.current_image_key == "equerre + regle":
+            return [
+                (self.tool_states[name], QRectF(self.tool_labels[name].geometry())) for name in self.combined_tools()
+            ]
+        return [(self.tool_states[self.current_image_key],
+                 QRectF(QPointF(self.image_label.mapTo(self, QPoint(0, 0))), QSizeF(self.image_label.size())))]
+
+    @timed_stage("input_mask")
+    def apply_input_mask(self):
+        """
+        Restreint la saisie de la fenêtre aux pixels visibles des outils et aux boutons
+        (mode clic à travers), ou la rend à toute la fenêtre.
+
+        Le masque limite aussi ce qui est peint : les traits du mode dessin et les mesures
+        affichées (F3) en font partie pour rester visibles.
+        """
+        if not self.click_through:
+            self.clearMask()
+            return
+        mask = QRegion()
+        for button in self.buttons:
+            mask += QRegion(QRect(button.mapTo(self, QPoint(0, 0)), button.size()))
+        if self.stats_overlay.isVisible():
+            mask += QRegion(self.stats_overlay.geometry())
+        mask += self.canvas.painted_region().translated(self.canvas.pos())
+        for state, rect in self.displayed_tools():
+            cached = self.input_region(state.frame_key(self.device_pixel_ratio))
+            if cached is None:
+                mask += QRegion(rect.toAlignedRect())
+                continue
+            region, size = cached
+            top_left = rect.center() - QPointF(size.width() / 2, size.height() / 2)
+            mask += region.translated(top_left.toPoint())
+        self.setMask(mask)
+
+    def resizeEvent(self, event):
+        self.canvas.resize(event.size())
+        self.request_input_mask()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # La fenêtre native n'existe qu'à partir du premier affichage
+        if not self.screen_tracked and self.windowHandle() is not None:
+            self.windowHandle().screenChanged.connect(self.update_device_pixel_ratio)
+            self.screen_tracked = True
+        self.update_device_pixel_ratio()
+
+    def update_device_pixel_ratio(self, screen=None):
+        """
+        Recalcule les images affichées si la fenêtre est passée sur un écran de densité différente.
+        """
+        ratio = self.devicePixelRatioF()
+        if ratio == self.device_pixel_ratio:
+            return
+        self.device_pixel_ratio = ratio
+        self.canvas.set_device_pixel_ratio(ratio)
+        if self.scene_view:
+            self.scene_view.device_pixel_ratio = ratio
+        if self.current_image_key != "equerre + regle":
+            self.update_displayed_image()
+        elif self.scene_view:
+            for item in list(self.scene_view.tool_items.values()):
+                self.transform_tool(item)
+        else:
+            for name in self.combined_tools():
+                self.transform_tool(self.tool_labels[name])
+
+    def cache_memory_bytes(self):
+        """
+        Mémoire occupée par les caches d'images (outils traités, pyramides, images rendues)
+        et par les surfaces d'aperçu des labels.
+        """
+        pyramids = sum(pyramid.memory_bytes() for pyramid in self.pyramids.values())
+        return self.asset_cache.memory_bytes() + pyramids + self.frame_cache.bytes + self.render_target_bytes()
 
-# Section principale pour lancer l'application
-try:
-    # Si l'application est exécutée via pyinstaller, récupérer les chemins d'accès aux images dans `_MEIPASS`
-    paths = sys._MEIPASS
-    rapporteur_path = os.path.join(paths, 'rapporteur.png')  # Chemin vers l'image du rapporteur
-    equerre_path = os.path.join(paths, 'equerre.png')  # Chemin vers l'image de l'équerre
-    regle_path = os.path.join(paths, 'regle.png')  # Chemin vers l'image de l'équerre
+    def render_target_bytes(self):
+        """
+        Mémoire occupée par les surfaces de rendu réutilisées des labels (aperçus pendant un geste).
+        """
+        labels = [self.image_label, *self.tool_labels.values()]
+        return sum(label.render_target.memory_bytes() for label in labels)
+
+    def toggle_stats_overlay(self):
+        """
+        Affiche ou masque les mesures de rendu (durée, événements par rendu, mémoire des caches).
+        """
+        visible = not self.stats_overlay.isVisible()
+        self.stats_overlay.setVisible(visible)
+        self.instrumentation.enabled = visible or self.timing_log is not None
+        if visible:
+            self.stats_overlay.setText("Mesures activées : en attente d'un rendu")
+            self.stats_overlay.adjustSize()
+            self.stats_overlay.raise_()
+        self.request_input_mask()
+
+    def update_stats_overlay(self, record):
+        """
+        Met à jour l'affichage des mesures avec le dernier rendu.
+        """
+        if not self.stats_overlay.isVisible():
+            return
+        lines = [
+            f"rendu : {record['frame_ms']:.1f} ms ({record['frame']})",
+            f"événements / rendu : {record['events']}",
+            f"caches : {self.cache_memory_bytes() / (1024 * 1024):.1f} Mio",
+            f"images rendues : {self.frame_cache.hits} trouvées, {self.frame_cache.misses} calculées",
+            f"surfaces d'aperçu : {self.render_target_bytes() / (1024 * 1024):.1f} Mio",
+        ]
+        lines += [f"  {stage} : {ms:.1f} ms" for stage, ms in sorted(record["stages"].items(), key=lambda item: -item[1])]
+        size = self.stats_overlay.size()
+        self.stats_overlay.setText("\n".join(lines))
+        self.stats_overlay.adjustSize()
+        self.stats_overlay.raise_()
+        if self.stats_overlay.size() != size:
+            self.request_input_mask()
+
+    def closeEvent(self, event):
+        self.prerender_timer.stop()
+        if self.pool:
+            self.pool.shutdown()
+        if self.input_trace:
+            try:
+                self.input_trace.save(self.input_trace_path)
+            except OSError as error:
+                print(f"Impossible d'écrire l'enregistrement des événements : {error}", file=sys.stderr)
+        if self.timing_log:
+            try:
+                self.instrumentation.dump(self.timing_log)
+            except OSError as error:
+                print(f"Impossible d'écrire le journal des mesures : {error}", file=sys.stderr)
+        super().closeEvent(event)
 
-except:
-    # Si l'application est exécutée directement, définir les chemins statiques
-    rapporteur_path = r'C://Users//MASSON//Downloads//Geomathiques//rapporteur.png'
-    equerre_path = r'C://Users//MASSON//Downloads//Geomathiques//equerre.png'
-    regle_path = r'C://Users//MASSON//Downloads//Geomathiques//regle.png'
+    def center_window(self):
+        screen = QApplication.desktop().screenGeometry()
+        self.move((screen.width() - self.width()) // 2, (screen.height() - self.height()) // 2)
 
 
-# Lancement de l'application
-app = QApplication(sys.argv)
-window = TransparentWindow(rapporteur_path, equerre_path, regle_path)
-window.show()
-sys.exit(app.exec_())
\ No newline at end of file
+if __name__ == "__main__":
+    # Section principale pour lancer l'application
+    try:
+        # Si l'application est exécutée via pyinstaller, récupérer les chemins d'accès aux images dans `_MEIPASS`
+        paths = sys._MEIPASS
+        rapporteur_path = os.path.join(paths, 'rapporteur.png')  # Chemin vers l'image du rapporteur
+        equerre_path = os.path.join(paths, 'equerre.png')  # Chemin vers l'image de l'équerre
+        regle_path = os.path.join(paths, 'regle.png')  # Chemin vers l'image de l'équerre
+
+    except:
+        # Si l'application est exécutée directement, définir les chemins statiques
+        rapporteur_path = r'C://Users//MASSON//Downloads//Geomathiques//rapporteur.png'
+        equerre_path = r'C://Users//MASSON//Downloads//Geomathiques//equerre.png'
+        regle_path = r'C://Users//MASSON//Downloads//Geomathiques//regle.png'
+
+    # Cache disque des outils traités, réutilisé d'un lancement à l'autre
+    cache_dir = os.path.join(os.path.expanduser("~"), ".geomathiques", "cache")
+
+    # Moteur de rendu QGraphicsView optionnel : python Geomathiques_2.py --scene
+    backend = "scene" if "--scene" in sys.argv else "label"
+
+    # Journal des mesures de rendu (JSON Lines) : python Geomathiques_2.py --timing-log mesures.jsonl
+    timing_log = sys.argv[sys.argv.index("--timing-log") + 1] if "--timing-log" in sys.argv[:-1] else None
+
+    # Enregistrement des événements souris / clavier, à rejouer avec benchmark.py --trace :
+    # python Geomathiques_2.py --record-trace gestes.trace
+    input_trace = sys.argv[sys.argv.index("--record-trace") + 1] if "--record-trace" in sys.argv[:-1] else None
+
+    # Budget mémoire des images gardées, en Mio : python Geomathiques_2.py --memory-budget 64
+    memory_budget = int(sys.argv[sys.argv.index("--memory-budget") + 1]) * 1024 * 1024 if "--memory-budget" in sys.argv[:-1] else None
+
+    # Outils dessinés en vectoriel plutôt qu'à partir des PNG : python Geomathiques_2.py --vector
+    skin = "vector" if "--vector" in sys.argv else "png"
+
+    # Paquet précompilé des outils, à côté des images : python Geomathiques_2.py --build-pack
+    asset_pack = os.path.join(os.path.dirname(rapporteur_path), "geomathiques.pack")
+
+    # Lancement de l'application, en pixels logiques sur les écrans à haute densité
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    app = QApplication(sys.argv)
+    if "--build-pack" in sys.argv:
+        TransparentWindow(rapporteur_path, equerre_path, regle_path).build_asset_pack(asset_pack)
+        print(f"Paquet d'outils écrit dans {asset_pack}")
+        sys.exit(0)
+    window = TransparentWindow(rapporteur_path, equerre_path, regle_path, cache_dir, backend, timing_log, asset_pack,
+                               memory_budget, skin=skin, input_trace=input_trace)
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,455 @@
+"""
+Mesure les performances des traitements d'image de Géomathiques, sans affichage.
+
+La suite s'exécute avec la plateforme Qt `offscreen` sur les images fournies avec
+l'application (rapporteur.png, equerre.png, regle.png). Pour chaque opération, elle
+affiche les percentiles de latence et le pic de mémoire, et peut comparer les
+résultats à une référence enregistrée : une régression fait échouer l'exécution.
+
+Utilisation :
+    python benchmark.py                       # Mesure et compare à la référence si elle existe
+    python benchmark.py --save-baseline       # Mesure et enregistre la référence
+    python benchmark.py --only transform_tool # Limite la suite aux opérations indiquées
+    python benchmark.py --trace gestes.trace  # Rejoue aussi un enregistrement (Geomathiques_2.py --record-trace)
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import time
+
+# La plateforme doit être choisie avant le premier import de PyQt5
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PIL import Image, ImageEnhance
+from PyQt5.QtCore import QEvent, Qt
+from PyQt5.QtWidgets import QApplication
+
+from Geomathiques_2 import InputTrace, TransparentWindow, enhance_contrast_brightness, make_white_transparent
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+IMAGES = {"rapporteur": "rapporteur.png", "equerre": "equerre.png", "regle": "regle.png"}
+DEFAULT_BASELINE = os.path.join(DIRECTORY, "benchmark_baseline.json")
+PERCENTILES = (50, 90, 99)
+
+
+def legacy_transparency(pil_image, alpha, tolerance=0):
+    """
+    Ancienne implémentation de la transparence : boucle Python sur chaque pixel.
+    """
+    threshold = 255 - tolerance
+    # getdata() est dépréciée à partir de Pillow 12
+    pixels = getattr(pil_image, "get_flattened_data", pil_image.getdata)()
+    data = [
+        (r, g, b, alpha if min(r, g, b) >= threshold else a)
+        for r, g, b, a in pixels
+    ]
+    pil_image.putdata(data)
+    return pil_image
+
+
+def legacy_enhance(pil_image, contrast, brightness):
+    """
+    Ancienne implémentation du contraste et de la luminosité : deux passes ImageEnhance.
+    """
+    pil_image = ImageEnhance.Contrast(pil_image).enhance(contrast)
+    return ImageEnhance.Brightness(pil_image).enhance(brightness)
+
+
+def percentile(samples, rank):
+    """
+    Percentile (méthode du rang le plus proche) d'une liste de mesures.
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(rank / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _memory_kib(field):
+    try:
+        with open("/proc/self/status") as status:
+            match = re.search(rf"{field}:\s+(\d+)", status.read())
+    except OSError:
+        return None
+    return int(match.group(1)) if match else None
+
+
+def reset_peak_memory():
+    """
+    Remet à zéro le pic de mémoire résidente du processus (Linux uniquement).
+
+    Returns:
+        int | None: Mémoire résidente actuelle en Kio, ou None si la mesure n'est pas disponible.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return None
+    return _memory_kib("VmRSS")
+
+
+def peak_memory():
+    """
+    Pic de mémoire résidente du processus depuis la dernière remise à zéro, en Kio.
+    """
+    return _memory_kib("VmHWM")
+
+
+class Benchmark:
+    """
+    Une opération mesurée : `setup` prépare chaque itération (hors chronométrage), `run` est chronométrée.
+    """
+
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+    def measure(self, repeat, warmup=1):
+        for _ in range(warmup):
+            if self.setup:
+                self.setup()
+            self.run()
+
+        resident = reset_peak_memory()
+        samples = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            start = time.perf_counter()
+            self.run()
+            samples.append((time.perf_counter() - start) * 1000)
+        peak = peak_memory()
+
+        result = {f"p{rank}": percentile(samples, rank) for rank in PERCENTILES}
+        result["peak_kib"] = peak - resident if resident is not None and peak is not None else None
+        return result
+
+
+def window_benchmarks(window):
+    """
+    Construit les opérations mesurées sur une fenêtre TransparentWindow.
+    """
+    benchmarks = []
+    angles = itertools.count(1, 7)
+
+    # Traitement complet d'un outil (transparence, contraste, luminosité, conversion Qt)
+    for key, name in IMAGES.items():
+        source = Image.open(os.path.join(DIRECTORY, name)).convert("RGBA")
+        images = []
+        benchmarks.append(Benchmark(
+            f"process_image[{key}]",
+            run=lambda images=images: window.process_image(images.pop()),
+            setup=lambda source=source, images=images: images.append(source.copy()),
+        ))
+
+    # Zoom + rotation de l'image principale, sans l'aide du cache des images rendues
+    def setup_update():
+        window.switch_image("Règle")
+        window.frame_cache.clear()
+        window.tool_states["regle"].angle = next(angles)
+        window.tool_states["regle"].scale = 1.3
+
+    benchmarks.append(Benchmark("update_displayed_image", window.update_displayed_image, setup_update))
+
+    # Aperçu rapide d'un geste, peint dans la surface de rendu réutilisée du label
+    benchmarks.append(Benchmark("render_preview", lambda: window.render_preview(
+        window.image_label, ("regle", next(angles), 1.3, window.device_pixel_ratio)
+    )))
+
+    # Rotation et zoom d'un outil dans le mode "Équerre + Règle"
+    def setup_transform():
+        if window.current_image_key != "equerre + regle":
+            window.switch_image("Équerre + Règle")
+        window.frame_cache.clear()
+
+    benchmarks.append(Benchmark(
+        "transform_tool", lambda: window.transform_tool(window.regle_label, 7, 1.01), setup_transform
+    ))
+
+    # Changement d'outil, avec les caches déjà remplis puis vidés
+    modes = itertools.cycle(["Rapporteur", "Équerre", "Règle", "Équerre + Règle"])
+    benchmarks.append(Benchmark("switch_image", lambda: window.switch_image(next(modes))))
+
+    def clear_caches():
+        window.asset_cache.clear()
+        window.pyramids.clear()
+        window.frame_cache.clear()
+        window.decode_reductions.clear()
+
+    benchmarks.append(Benchmark("switch_image[froid]", lambda: window.switch_image(next(modes)), clear_caches))
+
+    # Composition de l'équerre et de la règle, après un changement de transformation
+    def setup_composite():
+        window.frame_cache.clear()
+        window.tool_states["equerre"].angle = next(angles)
+
+    benchmarks.append(Benchmark(
+        "create_composite_image", lambda: window.create_composite_image("equerre", "regle"), setup_composite
+    ))
+
+    # Masque de saisie du mode clic à travers : région calculée depuis l'alpha, puis relue du cache
+    def setup_input_region():
+        window.switch_image("Rapporteur")
+        window.input_regions.clear()
+
+    def input_region():
+        state = window.tool_states["rapporteur"]
+        return window.input_region(state.frame_key(window.device_pixel_ratio))
+
+    benchmarks.append(Benchmark("input_region[froid]", input_region, setup_input_region))
+    benchmarks.append(Benchmark("input_region", input_region))
+    return benchmarks
+
+
+def transparency_benchmarks(white_tolerance):
+    """
+    Construit les mesures de la passe de transparence, ancienne et vectorisée, et vérifie
+    que les deux implémentations donnent le même résultat.
+    """
+    alpha = TransparentWindow.TRANSPARENCY_ALPHA
+    benchmarks = []
+    for key, name in IMAGES.items():
+        source = Image.open(os.path.join(DIRECTORY, name)).convert("RGBA")
+        expected = legacy_transparency(source.copy(), alpha, white_tolerance).tobytes()
+        if make_white_transparent(source.copy(), alpha, white_tolerance).tobytes() != expected:
+            raise SystemExit(f"{name} : résultats différents entre les deux implémentations de la transparence")
+        for label, function in (("boucle", legacy_transparency), ("vectorisée", make_white_transparent)):
+            images = []
+            benchmarks.append(Benchmark(
+                f"transparence {label}[{key}]",
+                run=lambda function=function, images=images: function(images.pop(), alpha, white_tolerance),
+                setup=lambda source=source, images=images: images.append(source.copy()),
+            ))
+    return benchmarks
+
+
+def enhance_benchmarks():
+    """
+    Construit les mesures du contraste et de la luminosité, en deux passes ImageEnhance et
+    en une seule table, et vérifie que les deux implémentations donnent le même résultat.
+    """
+    factors = (TransparentWindow.CONTRAST_FACTOR, TransparentWindow.BRIGHTNESS_FACTOR)
+    benchmarks = []
+    for key, name in IMAGES.items():
+        source = Image.open(os.path.join(DIRECTORY, name)).convert("RGBA")
+        if enhance_contrast_brightness(source, *factors).tobytes() != legacy_enhance(source, *factors).tobytes():
+            raise SystemExit(f"{name} : résultats différents entre les deux implémentations du contraste")
+        for label, function in (("ImageEnhance", legacy_enhance), ("table", enhance_contrast_brightness)):
+            benchmarks.append(Benchmark(
+                f"contraste {label}[{key}]", lambda function=function, source=source: function(source, *factors)
+            ))
+    return benchmarks
+
+
+def vector_benchmarks():
+    """
+    Construit les mesures du rendu vectoriel des outils (tracés peints à l'angle et au zoom demandés).
+    """
+    angles = itertools.count(1, 7)
+    benchmarks = []
+    for key, tool_class in TransparentWindow.VECTOR_TOOLS.items():
+        tool = tool_class()
+        benchmarks.append(Benchmark(f"rendu vectoriel[{key}]", lambda tool=tool: tool.render(next(angles), 1.3)))
+    return benchmarks
+
+
+def pool_benchmarks(paths):
+    """
+    Construit la mesure des changements d'outil avec décodage dans le pool et un budget
+    mémoire minuscule : chaque mode demandé doit finir par s'afficher, malgré les évictions.
+    """
+    app = QApplication.instance()
+    window = TransparentWindow(*paths, memory_budget=1024 * 1024, workers=2)
+    shown_keys = {"Rapporteur": "rapporteur", "Équerre": "equerre", "Règle": "regle",
+                  "Équerre + Règle": "equerre + regle"}
+    modes = itertools.cycle(TransparentWindow.TOOL_MODES)
+
+    def switch_image():
+        mode = next(modes)
+        window.switch_image(mode)
+        deadline = time.perf_counter() + 5
+        while window.current_image_key != shown_keys[mode] or window.tool_waiters:
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"{mode} : mode jamais affiché avec le pool et un budget de 1 Mio")
+            app.processEvents()
+            time.sleep(0.0005)
+
+    return [Benchmark("switch_image[pool, petit budget]", switch_image)]
+
+
+def replay_trace(window, path):
+    """
+    Rejoue un enregistrement d'événements sur la fenêtre (du même moteur de rendu que
+    l'enregistrement), au rythme d'origine, et mesure la latence de bout en bout de
+    chaque événement : du moment où il est remis à la fenêtre jusqu'au rendu qui en
+    tient compte, ou jusqu'au retour du gestionnaire s'il ne demande aucun rendu.
+
+    Returns:
+        dict: Percentiles de latence (ms), pic de mémoire, nombre de rendus, nombre
+        d'images manquées (rendus plus longs que l'intervalle entre deux images) et
+        taux de réussite du cache des images rendues.
+    """
+    app = QApplication.instance()
+    header, events = InputTrace.load(path)
+    window.restore_trace_header(header)
+    window.frame_cache.clear()
+    hits, misses = window.frame_cache.hits, window.frame_cache.misses
+    instrumentation = window.instrumentation
+    enabled, on_frame = instrumentation.enabled, instrumentation.on_frame
+    latencies, waiting, frames = [], [], []
+
+    def frame_done(record):
+        # Les événements en attente sont pris en compte par ce rendu
+        done = time.perf_counter()
+        frames.append(record["frame_ms"])
+        latencies.extend((done - sent) * 1000 for sent in waiting)
+        waiting.clear()
+
+    instrumentation.enabled, instrumentation.on_frame = True, frame_done
+    resident = reset_peak_memory()
+    start = time.perf_counter()
+    try:
+        for elapsed, event in events:
+            # Attendre l'instant d'origine en laissant tourner la boucle d'événements (rendus planifiés)
+            while time.perf_counter() < start + elapsed:
+                app.processEvents()
+                time.sleep(0.0005)
+            if isinstance(event, QEvent) and event.type() == QEvent.KeyPress and event.key() == Qt.Key_Escape:
+                continue  # Ouvrirait la confirmation de sortie (fenêtre modale)
+            sent = time.perf_counter()
+            if isinstance(event, int):
+                window.switch_image(TransparentWindow.TOOL_MODES[event])
+            else:
+                QApplication.sendEvent(window, event)
+            if window.scheduler.pending:
+                waiting.append(sent)
+            else:
+                latencies.append((time.perf_counter() - sent) * 1000)
+        while window.scheduler.pending:
+            app.processEvents()
+            time.sleep(0.0005)
+    finally:
+        instrumentation.enabled, instrumentation.on_frame = enabled, on_frame
+    peak = peak_memory()
+    if not latencies:
+        raise SystemExit(f"{path} : aucun événement à rejouer")
+
+    result = {f"p{rank}": percentile(latencies, rank) for rank in PERCENTILES}
+    result["peak_kib"] = peak - resident if resident is not None and peak is not None else None
+    result["frames"] = len(frames)
+    result["dropped"] = sum(1 for frame_ms in frames if frame_ms > 1000 / window.MAX_FPS)
+    hits, misses = window.frame_cache.hits - hits, window.frame_cache.misses - misses
+    result["cache_hit_rate"] = hits / (hits + misses) if hits + misses else None
+    return result
+
+
+def compare(results, baseline, max_regression):
+    """
+    Compare les médianes aux valeurs de référence.
+
+    Returns:
+        list: Messages décrivant les régressions détectées.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        limit = reference["p50"] * (1 + max_regression)
+        if result["p50"] > limit:
+            regressions.append(
+                f"{name} : médiane {result['p50']:.2f} ms > {limit:.2f} ms "
+                f"(référence {reference['p50']:.2f} ms + {max_regression:.0%})"
+            )
+        if "dropped" in result and "dropped" in reference:
+            dropped_limit = math.ceil(reference["dropped"] * (1 + max_regression))
+            if result["dropped"] > dropped_limit:
+                regressions.append(
+                    f"{name} : {result['dropped']} images manquées > {dropped_limit} "
+                    f"(référence {reference['dropped']} + {max_regression:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30, help="Nombre de mesures par opération")
+    parser.add_argument("--only", nargs="*", help="Noms (ou débuts de noms) des opérations à mesurer")
+    parser.add_argument("--white-tolerance", type=int, default=TransparentWindow.WHITE_TOLERANCE,
+                        help="Tolérance autour du blanc pour la passe de transparence")
+    parser.add_argument("--trace", nargs="+", default=[], help="Enregistrements d'événements à rejouer")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier JSON des valeurs de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les mesures comme référence")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Dégradation maximale tolérée de la médiane (0.25 = +25 %%)")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    paths = [os.path.join(DIRECTORY, name) for name in IMAGES.values()]
+    # Traitements synchrones : chaque mesure inclut tout le travail demandé
+    window = TransparentWindow(*paths, workers=0)
+
+    benchmarks = (transparency_benchmarks(args.white_tolerance) + enhance_benchmarks() + window_benchmarks(window)
+                  + vector_benchmarks() + pool_benchmarks(paths))
+    if args.only:
+        benchmarks = [b for b in benchmarks if any(b.name.startswith(prefix) for prefix in args.only)]
+
+    header = "".join(f"{f'p{rank} (ms)':>11}" for rank in PERCENTILES)
+    print(f"{'opération':<34}{header}{'pic (Kio)':>12}")
+    results = {}
+    for benchmark in benchmarks:
+        result = benchmark.measure(args.repeat)
+        results[benchmark.name] = result
+        values = "".join(f"{result[f'p{rank}']:>11.2f}" for rank in PERCENTILES)
+        peak = "-" if result["peak_kib"] is None else result["peak_kib"]
+        print(f"{benchmark.name:<34}{values}{peak:>12}")
+
+    windows = {window.backend: window}
+    for path in args.trace:
+        name = f"trace[{os.path.splitext(os.path.basename(path))[0]}]"
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        # Les positions enregistrées n'ont de sens que dans le moteur de rendu d'origine
+        backend = InputTrace.load(path)[0].get("backend", window.backend)
+        if backend not in windows:
+            windows[backend] = TransparentWindow(*paths, backend=backend, workers=0)
+        result = replay_trace(windows[backend], path)
+        results[name] = result
+        values = "".join(f"{result[f'p{rank}']:>11.2f}" for rank in PERCENTILES)
+        peak = "-" if result["peak_kib"] is None else result["peak_kib"]
+        hit_rate = "-" if result["cache_hit_rate"] is None else f"{result['cache_hit_rate']:.0%}"
+        print(f"{name:<34}{values}{peak:>12}    {result['frames']} rendus, {result['dropped']} images manquées, "
+              f"cache {hit_rate}")
+
+    app.processEvents()
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Référence enregistrée dans {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print("\nRégressions détectées :")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("\nAucune régression par rapport à la référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())